@@ -1,5 +1 @@
-from API.app import app
-from API.views import *
-
-if __name__ == "__main__":
-    app.run(debug=False)
+from API.app import create_app
@@ -0,0 +1,55 @@
+import hashlib
+import hmac
+import secrets
+from sqlalchemy import select
+from DB.models import ApiKey, Users
+from API.token_cache import CachedUser, TokenCache
+
+# Random bytes per key, 43 URL-safe characters once encoded
+API_KEY_BYTES = 32
+# Characters of the key kept in the clear to identify it in listings
+API_KEY_PREFIX_LENGTH = 8
+
+# key hash -> CachedUser, so repeated requests skip the lookup. Revoking
+# drops the entry in this worker, other workers stop accepting the key
+# within TOKEN_CACHE_TTL seconds.
+api_key_cache = TokenCache()
+
+
+def generate_api_key() -> str:
+    return secrets.token_urlsafe(API_KEY_BYTES)
+
+
+# Keyed with SECRET_KEY so a copy of the api_key table is useless on its own.
+# Changing SECRET_KEY invalidates every key.
+def hash_api_key(key: str, secret_key: str) -> str:
+    return hmac.new(secret_key.encode(), key.encode(), hashlib.sha256).hexdigest()
+
+
+# The user a live key belongs to, by key hash
+def api_key_query(key_hash: str):
+    return (
+        select(Users.id, Users.public_id, Users.name, Users.admin, ApiKey.key_hash)
+        .join(ApiKey, ApiKey.user_id == Users.id)
+        .where(ApiKey.key_hash == key_hash, ApiKey.revoked_at.is_(None))
+    )
+
+
+# CachedUser for an api_key_query row (None when the key was not found),
+# remembered for the next request with the same key
+def api_key_user(row, key_hash: str):
+    if row is None or not hmac.compare_digest(row.key_hash, key_hash):
+        return None
+    current_user = CachedUser(row)
+    api_key_cache.set(key_hash, current_user)
+    return current_user
+
+
+# CachedUser the key authenticates, None if it is unknown or revoked
+def verify_api_key(session, key: str, secret_key: str):
+    key_hash = hash_api_key(key, secret_key)
+    current_user = api_key_cache.get(key_hash)
+    if current_user is None:
+        row = session.execute(api_key_query(key_hash)).first()
+        current_user = api_key_user(row, key_hash)
+    return current_user
@@ -0,0 +1,521 @@
+# ASGI serving mode. The person and agency read routes run as coroutines on
+# an async engine (asyncpg on Postgres, aiosqlite on SQLite), every other
+# route is handed to the Flask app on a worker thread:
+#
+#   uvicorn --factory API.asgi:create_asgi_app --workers 4
+#
+# Responses match what API.wsgi sends for the same request, ETags, payload
+# cache and compression included. Pool settings come from the same
+# DB_POOL_* values, per worker process.
+import datetime
+import random
+import time
+from collections import defaultdict
+import jwt
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import create_async_engine
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware.wsgi import WSGIMiddleware
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import (
+    http_date,
+    parse_accept_header,
+    parse_date,
+    parse_etags,
+    quote_etag,
+)
+from DB.models import db, Users, Person, Agency
+from DB.bulk import chunks
+from DB.links import linked_agencies
+from DB.routing import REPLICA_BIND_PREFIX
+from DB.versioning import version_query
+from API.app import create_app
+from API.api_keys import api_key_cache, api_key_query, api_key_user, hash_api_key
+from API.compression import (
+    CACHE_MIN_SIZE,
+    COMPRESSORS,
+    MIN_COMPRESS_SIZE,
+    compress,
+    payload_cache,
+)
+from API.conditional import etag_for, response_tables
+from API.filters import FilterError, get_ids, person_filters
+from API.metrics import REQUEST_LATENCY, RESPONSE_SIZE
+from API.pagination import (
+    AGENCY_SORT_KEYS,
+    PERSON_SORT_KEYS,
+    PaginationError,
+    get_page_params,
+    keyset_phases,
+    next_page,
+)
+from API.serializers import (
+    AGENCY_FIELDS,
+    FieldError,
+    get_expand,
+    get_fields,
+    row_serializer,
+    select_columns,
+)
+from API.streaming import NDJSON_MIMETYPE, STREAM_BATCH_SIZE
+from API.token_cache import CachedUser, token_cache
+
+# Sync driver -> the async driver for the same database
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url):
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+# Engines for the primary and the replicas, built from the URLs Flask-SQLAlchemy
+# resolved so relative SQLite paths and binds point at the same databases
+class AsyncEngines:
+    def __init__(self, flask_app):
+        options = flask_app.config.get("SQLALCHEMY_ENGINE_OPTIONS", dict())
+        with flask_app.app_context():
+            urls = {key: engine.url for key, engine in db.engines.items()}
+        self.primary = create_async_engine(async_url(urls.pop(None)), **options)
+        self.replicas = [
+            create_async_engine(async_url(url), **options)
+            for key, url in sorted(urls.items())
+            if key.startswith(REPLICA_BIND_PREFIX)
+        ]
+
+    # Everything served here is a read, so any replica will do
+    def connect(self):
+        if self.replicas:
+            return random.choice(self.replicas).connect()
+        return self.primary.connect()
+
+    async def dispose(self):
+        for engine in [self.primary] + self.replicas:
+            await engine.dispose()
+
+
+class ReadContext:
+    def __init__(self, reads, request: Request, conn, current_user):
+        self.reads = reads
+        self.request = request
+        self.args = request.query_params
+        self.conn = conn
+        self.current_user = current_user
+
+    # Same bytes as jsonify outside debug mode
+    def json(self, data: dict, status: int = 200) -> Response:
+        body = self.reads.flask_app.json.dumps(data, separators=(",", ":")) + "\n"
+        return Response(body, status, media_type="application/json")
+
+    def message(self, message: str, status: int = 200) -> Response:
+        return self.json({"message": message}, status)
+
+    # Streamed on a connection of its own, which the body iterator closes
+    def stream(self, query, serialize, key: str) -> Response:
+        dumps = self.reads.flask_app.json.dumps
+        ndjson = _accepts_ndjson(self.request)
+
+        async def body():
+            async with self.reads.engines.connect() as conn:
+                result = await conn.stream(
+                    query.execution_options(yield_per=STREAM_BATCH_SIZE)
+                )
+                first = True
+                if not ndjson:
+                    yield '{"%s":[' % key
+                async for rows in result.partitions():
+                    batch = [dumps(serialize(row)) for row in rows]
+                    if ndjson:
+                        yield "\n".join(batch) + "\n"
+                    else:
+                        yield ("" if first else ",") + ",".join(batch)
+                    first = False
+                if not ndjson:
+                    yield "]}"
+
+        mimetype = NDJSON_MIMETYPE if ndjson else "application/json"
+        return StreamingResponse(body(), media_type=mimetype)
+
+
+def _accepts_ndjson(request: Request) -> bool:
+    accept = parse_accept_header(request.headers.get("accept"))
+    return accept.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def wants_stream(request: Request) -> bool:
+    if request.query_params.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return _accepts_ndjson(request)
+
+
+# token_required, reading the user through conn
+async def authenticate(request: Request, conn, secret_key: str):
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        key_hash = hash_api_key(api_key, secret_key)
+        current_user = api_key_cache.get(key_hash)
+        if current_user is None:
+            row = (await conn.execute(api_key_query(key_hash))).first()
+            current_user = api_key_user(row, key_hash)
+        if current_user is None:
+            return None, "API key is invalid!"
+        return current_user, None
+
+    token = request.headers.get("x-access-token")
+    if not token:
+        return None, "Token is missing!"
+
+    current_user = token_cache.get(token)
+    if current_user is None:
+        try:
+            data = jwt.decode(token, secret_key, algorithms="HS256")
+            result = await conn.execute(
+                select(Users).where(Users.public_id == data["public_id"])
+            )
+            user = result.first()
+        except Exception:
+            return None, "Token is invalid!"
+
+        if not user:
+            return None, "Token is invalid!"
+        current_user = CachedUser(user)
+        token_cache.set(token, current_user, data.get("exp"))
+    return current_user, None
+
+
+def not_modified(request: Request, etag: str, last_modified) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        return parse_etags(if_none_match).contains(etag)
+    if_modified_since = parse_date(request.headers.get("if-modified-since"))
+    if if_modified_since and last_modified:
+        return if_modified_since >= last_modified
+    return False
+
+
+# Flask-CORS with its defaults: echo the Origin, * when there is none
+def add_cors_headers(request: Request, response: Response):
+    origin = request.headers.get("origin")
+    response.headers["Access-Control-Allow-Origin"] = origin or "*"
+    if origin:
+        response.headers.append("Vary", "Origin")
+
+
+def _add_vary(response: Response, value: str):
+    vary = [v for v in response.headers.get("vary", "").split(", ") if v]
+    if value not in vary:
+        response.headers["Vary"] = ", ".join(vary + [value])
+
+
+def _set_encoded_body(response: Response, data: bytes, encoding: str):
+    response.body = data
+    response.headers["Content-Length"] = str(len(data))
+    response.headers["Content-Encoding"] = encoding
+
+
+# token_required + conditional_get + compress_response for an async view.
+# The view gets a ReadContext and the URL values and returns a Response.
+def read_view(table_name: str, expand: dict = None):
+    def decorator(f):
+        async def endpoint(reads, request: Request, **values) -> Response:
+            async with reads.engines.connect() as conn:
+                current_user, error = await authenticate(
+                    request, conn, reads.flask_app.config["SECRET_KEY"]
+                )
+                if error:
+                    return ReadContext(reads, request, conn, None).message(error, 401)
+
+                tables = response_tables(
+                    table_name, expand or dict(), request.query_params
+                )
+                versions = list()
+                for table in tables:
+                    row = (await conn.execute(version_query(table))).first()
+                    versions.append(tuple(row) if row else (0, None))
+                accept_encoding = parse_accept_header(
+                    request.headers.get("accept-encoding")
+                )
+                encoding = accept_encoding.best_match(list(COMPRESSORS))
+                full_path = f"{request.url.path}?{request.url.query}"
+                etag = etag_for(
+                    "-".join(tables),
+                    ".".join(str(v) for v, _ in versions),
+                    full_path,
+                    request.headers.get("accept", ""),
+                    encoding,
+                )
+                updated = [u for _, u in versions if u]
+                last_modified = None
+                if updated:
+                    last_modified = max(updated).replace(tzinfo=datetime.timezone.utc)
+
+                directory = reads.flask_app.config.get("COMPRESSION_CACHE_DIR")
+                cache_key = f"{etag}:{encoding}"
+                data = None
+                if not_modified(request, etag, last_modified):
+                    response = Response(status_code=304)
+                else:
+                    if encoding is not None:
+                        data = payload_cache.get(cache_key, directory)
+                    if data is None:
+                        context = ReadContext(reads, request, conn, current_user)
+                        response = await f(context, **values)
+                        if response.status_code != 200:
+                            return response
+                    else:
+                        response = Response(media_type="application/json")
+                        _add_vary(response, "Accept-Encoding")
+                        _set_encoded_body(response, data, encoding)
+
+            if data is None and encoding is not None and response.status_code == 200:
+                body = getattr(response, "body", None)
+                if body is not None and len(body) >= CACHE_MIN_SIZE:
+                    # slow enough at this size to stall every other request
+                    data = await run_in_threadpool(compress, body, encoding, True)
+                    payload_cache.set(cache_key, data, directory)
+                    _add_vary(response, "Accept-Encoding")
+                    _set_encoded_body(response, data, encoding)
+                elif body is not None and len(body) >= MIN_COMPRESS_SIZE:
+                    _set_encoded_body(response, compress(body, encoding), encoding)
+
+            response.headers["ETag"] = quote_etag(etag)
+            if last_modified:
+                response.headers["Last-Modified"] = http_date(last_modified)
+            _add_vary(response, "Accept")
+            _add_vary(response, "Accept-Encoding")
+            return response
+
+        return endpoint
+
+    return decorator
+
+
+# pagination.paginate on conn
+async def paginate(conn, query, model, page) -> tuple:
+    rows = list()
+    for phase in keyset_phases(query, model, page):
+        result = await conn.execute(phase.limit(page.limit + 1 - len(rows)))
+        rows += result.all()
+        if len(rows) > page.limit:
+            break
+    return next_page(rows, page)
+
+
+##############################################################################
+# Person Views
+##############################################################################
+# ?expand=agencies, as views.embed_agencies
+async def embed_agencies(conn, person_ids: list, output: list):
+    serialize = row_serializer(AGENCY_FIELDS)
+    agencies = defaultdict(list)
+    columns = select_columns(Agency, AGENCY_FIELDS)
+    for chunk in chunks(list(set(person_ids))):
+        for row in await conn.execute(linked_agencies(chunk, columns)):
+            agencies[row[0]].append(serialize(row[1:]))
+    for person_id, person_data in zip(person_ids, output):
+        person_data["agencies"] = agencies.get(person_id, list())
+
+
+async def serialize_people(context: ReadContext, rows, fields, expand) -> list:
+    serialize = row_serializer(fields)
+    output = list()
+    person_ids = list()
+
+    for person in rows:
+        output.append(serialize(person))
+        person_ids.append(person.id)
+    if "agencies" in expand:
+        await embed_agencies(context.conn, person_ids, output)
+    return output
+
+
+@read_view("person", expand={"agencies": "agency"})
+async def get_all_people(context: ReadContext) -> Response:
+    try:
+        page = get_page_params(context.args, PERSON_SORT_KEYS, Person)
+        fields = get_fields(context.args, Person)
+        expand = get_expand(context.args, Person)
+    except (PaginationError, FieldError) as e:
+        return context.message(str(e), 400)
+
+    if page:
+        columns = select_columns(Person, fields, extra=(page.sort, "db_id", "id"))
+        query = select(*columns)
+        people, next_cursor = await paginate(context.conn, query, Person, page)
+        output = await serialize_people(context, people, fields, expand)
+        return context.json({"people": output, "next_cursor": next_cursor})
+
+    query = select(*select_columns(Person, fields, extra=("id",)))
+    if wants_stream(context.request) and not expand:
+        return context.stream(
+            query.order_by(Person.db_id), row_serializer(fields), "people"
+        )
+    people = await context.conn.execute(query)
+    output = await serialize_people(context, people, fields, expand)
+    return context.json({"people": output})
+
+
+@read_view("person", expand={"agencies": "agency"})
+async def get_person(context: ReadContext, id: str) -> Response:
+    try:
+        fields = get_fields(context.args, Person)
+        expand = get_expand(context.args, Person)
+    except FieldError as e:
+        return context.message(str(e), 400)
+
+    query = select(*select_columns(Person, fields)).where(Person.id == id)
+    person = (await context.conn.execute(query)).first()
+
+    if not person:
+        return context.message("No person found with this id")
+
+    person_data = row_serializer(fields)(person)
+    if "agencies" in expand:
+        await embed_agencies(context.conn, [id], [person_data])
+    return context.json({"people": person_data})
+
+
+@read_view("person", expand={"agencies": "agency"})
+async def get_person_parameterized(context: ReadContext) -> Response:
+    try:
+        fields = get_fields(context.args, Person)
+        expand = get_expand(context.args, Person)
+        clauses = person_filters(context.args)
+        id_list = get_ids(context.args.getlist("id"))
+    except (FieldError, FilterError) as e:
+        return context.message(str(e), 400)
+
+    query = select(*select_columns(Person, fields, extra=("id",))).where(*clauses)
+    if id_list:
+        query = query.where(Person.id.in_(id_list))
+    if wants_stream(context.request) and not expand:
+        return context.stream(query, row_serializer(fields), "people")
+    people = await context.conn.execute(query)
+    output = await serialize_people(context, people, fields, expand)
+    return context.json({"people": output})
+
+
+##############################################################################
+# Agency Views
+##############################################################################
+@read_view("agency")
+async def get_all_agencies(context: ReadContext) -> Response:
+    try:
+        page = get_page_params(context.args, AGENCY_SORT_KEYS, Agency)
+        fields = get_fields(context.args, Agency)
+    except (PaginationError, FieldError) as e:
+        return context.message(str(e), 400)
+
+    serialize = row_serializer(fields)
+    if page:
+        columns = select_columns(Agency, fields, extra=(page.sort, "db_id"))
+        query = select(*columns)
+        agencies, next_cursor = await paginate(context.conn, query, Agency, page)
+        output = [serialize(agency) for agency in agencies]
+        return context.json({"agencies": output, "next_cursor": next_cursor})
+
+    query = select(*select_columns(Agency, fields))
+    if wants_stream(context.request):
+        return context.stream(query.order_by(Agency.db_id), serialize, "agencies")
+    agencies = await context.conn.execute(query)
+    return context.json({"agencies": [serialize(agency) for agency in agencies]})
+
+
+@read_view("agency")
+async def get_agency(context: ReadContext, id: str) -> Response:
+    try:
+        fields = get_fields(context.args, Agency)
+    except FieldError as e:
+        return context.message(str(e), 400)
+
+    query = select(*select_columns(Agency, fields)).where(Agency.id == id)
+    agency = (await context.conn.execute(query)).first()
+
+    if not agency:
+        return context.message("No agency found with this id")
+
+    return context.json({"agencies": row_serializer(fields)(agency)})
+
+
+@read_view("agency")
+async def get_agency_parameterized(context: ReadContext) -> Response:
+    try:
+        fields = get_fields(context.args, Agency)
+    except FieldError as e:
+        return context.message(str(e), 400)
+
+    query = select(*select_columns(Agency, fields))
+    id_list = context.args.getlist("id")
+    if id_list:
+        query = query.where(Agency.id.in_(id_list))
+
+    serialize = row_serializer(fields)
+    agencies = await context.conn.execute(query)
+    return context.json({"agencies": [serialize(agency) for agency in agencies]})
+
+
+# Flask endpoint -> async view serving it
+ASYNC_VIEWS = {
+    "api.get_all_people": get_all_people,
+    "api.get_person": get_person,
+    "api.get_person_parameterized": get_person_parameterized,
+    "api.get_all_agencies": get_all_agencies,
+    "api.get_agency": get_agency,
+    "api.get_agency_parameterized": get_agency_parameterized,
+}
+
+
+# ASGI app. Routes GETs through the Flask url_map, so both modes agree on which view
+# a path belongs to, and runs the async view when there is one
+class AsyncReads:
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.engines = AsyncEngines(flask_app)
+        self.wsgi = WSGIMiddleware(flask_app)
+        self.urls = flask_app.url_map.bind("localhost")
+
+    # (url rule, URL values) of an async view, (None, None) for Flask
+    def match(self, scope) -> tuple:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            return None, None
+        try:
+            rule, values = self.urls.match(scope["path"], "GET", return_rule=True)
+        except HTTPException:
+            return None, None
+        if rule.endpoint not in ASYNC_VIEWS:
+            return None, None
+        return rule, values
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        rule, values = self.match(scope)
+        if rule is None:
+            return await self.wsgi(scope, receive, send)
+
+        started = time.perf_counter()
+        request = Request(scope, receive)
+        response = await ASYNC_VIEWS[rule.endpoint](self, request, **values)
+        add_cors_headers(request, response)
+        route = rule.rule
+        REQUEST_LATENCY.labels("GET", route, response.status_code).observe(
+            time.perf_counter() - started
+        )
+        if not isinstance(response, StreamingResponse):
+            RESPONSE_SIZE.labels("GET", route).observe(len(response.body))
+        await response(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.engines.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(database_uri: str = None, config: dict = None) -> AsyncReads:
+    return AsyncReads(create_app(database_uri, config))
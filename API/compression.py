@@ -0,0 +1,206 @@
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from flask import current_app, make_response, request
+
+# brotli and zstandard are pinned in requirements.txt but stay optional,
+# gzip is always offered
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this go out uncompressed
+MIN_COMPRESS_SIZE = 1024
+# conditional_get bodies at least this big are compressed once per ETag and
+# encoding and reused, in memory and in COMPRESSION_CACHE_DIR when set
+CACHE_MIN_SIZE = 64 * 1024
+PAYLOAD_CACHE_BYTES = 64 * 1024 * 1024
+PAYLOAD_CACHE_FILES = 64
+
+COMPRESSIBLE_MIMETYPES = ("application/json",)
+
+# Files still being written to the cache dir
+PARTIAL_PREFIX = ".partial-"
+
+
+# {encoding: (fast, best)} in server preference order. fast is used for
+# per-request compression, best for payloads that get cached.
+def _compressors() -> dict:
+    compressors = dict()
+    if brotli is not None:
+        compressors["br"] = (
+            lambda data: brotli.compress(data, quality=4),
+            lambda data: brotli.compress(data, quality=9),
+        )
+    if zstandard is not None:
+        compressors["zstd"] = (
+            lambda data: zstandard.ZstdCompressor(level=3).compress(data),
+            lambda data: zstandard.ZstdCompressor(level=12).compress(data),
+        )
+    compressors["gzip"] = (
+        lambda data: gzip.compress(data, compresslevel=5, mtime=0),
+        lambda data: gzip.compress(data, compresslevel=9, mtime=0),
+    )
+    return compressors
+
+
+COMPRESSORS = _compressors()
+
+
+# Best encoding the client accepts, None for identity
+def choose_encoding():
+    return request.accept_encodings.best_match(list(COMPRESSORS))
+
+
+def compress(data: bytes, encoding: str, best: bool = False) -> bytes:
+    fast, slow = COMPRESSORS[encoding]
+    return slow(data) if best else fast(data)
+
+
+def compressible(response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.direct_passthrough
+        and not response.is_streamed
+        and "Content-Encoding" not in response.headers
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and "no-transform" not in response.headers.get("Cache-Control", "")
+    )
+
+
+# Bounded-by-bytes LRU of compressed payloads, backed by an optional
+# directory shared by every uWSGI worker
+class PayloadCache:
+    def __init__(self, maxbytes: int = PAYLOAD_CACHE_BYTES):
+        self.maxbytes = maxbytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _path(directory: str, key: str) -> str:
+        return os.path.join(directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key: str, directory: str = None):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                return data
+        if not directory:
+            return None
+        try:
+            with open(self._path(directory, key), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        self._remember(key, data)
+        return data
+
+    def set(self, key: str, data: bytes, directory: str = None):
+        self._remember(key, data)
+        if directory:
+            self._write(directory, key, data)
+
+    def _remember(self, key: str, data: bytes):
+        if len(data) > self.maxbytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self.size += len(data)
+            while self.size > self.maxbytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    # Write via a temp file + rename so other workers never read a partial
+    # file, then drop the oldest files past PAYLOAD_CACHE_FILES
+    def _write(self, directory: str, key: str, data: bytes):
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=directory, prefix=PARTIAL_PREFIX, delete=False
+            ) as f:
+                f.write(data)
+            os.replace(f.name, self._path(directory, key))
+
+            paths = [
+                os.path.join(directory, name)
+                for name in os.listdir(directory)
+                if not name.startswith(PARTIAL_PREFIX)
+            ]
+            paths.sort(key=_mtime)
+            for path in paths[: max(len(paths) - PAYLOAD_CACHE_FILES, 0)]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0
+
+
+payload_cache = PayloadCache()
+
+
+def set_encoded_data(response, data: bytes, encoding: str):
+    response.set_data(data)
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+# The cached compressed body for etag, as a response, or None
+def cached_response(etag: str, encoding: str):
+    if encoding is None:
+        return None
+    directory = current_app.config.get("COMPRESSION_CACHE_DIR")
+    data = payload_cache.get(f"{etag}:{encoding}", directory)
+    if data is None:
+        return None
+    response = make_response(data)
+    response.mimetype = "application/json"
+    return set_encoded_data(response, data, encoding)
+
+
+# Compress a large fresh response once and keep the bytes for the next
+# request with the same ETag and encoding
+def cache_response(etag: str, encoding: str, response):
+    if encoding is None or not compressible(response):
+        return response
+    data = response.get_data()
+    if len(data) < CACHE_MIN_SIZE:
+        return response
+    data = compress(data, encoding, best=True)
+    directory = current_app.config.get("COMPRESSION_CACHE_DIR")
+    payload_cache.set(f"{etag}:{encoding}", data, directory)
+    return set_encoded_data(response, data, encoding)
+
+
+# after_request hook: compress everything else on the fly
+def compress_response(response):
+    if not compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_encoding()
+    data = response.get_data()
+    if encoding is None or len(data) < MIN_COMPRESS_SIZE:
+        return response
+    return set_encoded_data(response, compress(data, encoding), encoding)
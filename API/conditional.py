@@ -0,0 +1,79 @@
+import datetime
+import hashlib
+from functools import wraps
+from flask import request, make_response
+from DB.models import db
+from DB.versioning import get_version
+from API.compression import cache_response, cached_response, choose_encoding
+
+
+# The same table version yields different bodies for different query strings,
+# Accept headers and content encodings, so all of them go into the tag
+def make_etag(table_name: str, version, encoding: str = None) -> str:
+    accept = request.headers.get("Accept", "")
+    return etag_for(table_name, version, request.full_path, accept, encoding)
+
+
+# full_path is the path plus "?" and the raw query string, as Flask builds it
+def etag_for(table_name: str, version, full_path: str, accept: str, encoding) -> str:
+    key = f"{table_name}:{version}:{full_path}:{accept}:{encoding}"
+    return f"{table_name}-{version}-{hashlib.sha1(key.encode()).hexdigest()[:16]}"
+
+
+# Tables a response depends on: table_name, plus the table behind each
+# ?expand= value the request asked for
+def response_tables(table_name: str, expand: dict, args) -> list:
+    requested = set()
+    for value in args.getlist("expand"):
+        requested.update(e.strip() for e in value.split(","))
+    return [table_name] + [expand[e] for e in sorted(requested) if e in expand]
+
+
+def not_modified(etag: str, last_modified) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return request.if_modified_since >= last_modified
+    return False
+
+
+# Answer If-None-Match / If-Modified-Since from the table's version row
+# without running the view, serve large bodies precompressed from the payload
+# cache, and tag fresh 200 responses.
+# expand maps ?expand= values to the extra table they embed, e.g.
+# {"agencies": "agency"}, so edits there also change the tag.
+def conditional_get(table_name: str, expand: dict = None):
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            tables = response_tables(table_name, expand or dict(), request.args)
+            versions = [get_version(db.session, t) for t in tables]
+            encoding = choose_encoding()
+            etag = make_etag(
+                "-".join(tables), ".".join(str(v) for v, _ in versions), encoding
+            )
+            updated = [u for _, u in versions if u]
+            last_modified = None
+            if updated:
+                last_modified = max(updated).replace(tzinfo=datetime.timezone.utc)
+
+            if not_modified(etag, last_modified):
+                response = make_response("", 304)
+            else:
+                response = cached_response(etag, encoding)
+            if response is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response = cache_response(etag, encoding, response)
+
+            response.set_etag(etag)
+            if last_modified:
+                response.last_modified = last_modified
+            response.vary.add("Accept")
+            response.vary.add("Accept-Encoding")
+            return response
+
+        return decorated
+
+    return decorator
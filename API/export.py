@@ -0,0 +1,157 @@
+import csv
+import io
+from itertools import islice
+from flask import Response, stream_with_context
+from sqlalchemy import Boolean, Date, Float, Integer, String
+from API.streaming import STREAM_BATCH_SIZE
+
+# pyarrow is pinned in requirements.txt but stays optional, only parquet and
+# arrow exports need it
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+EXPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+ARROW_FORMATS = ("parquet", "arrow")
+
+# Rows per Parquet row group. Rows are converted STREAM_BATCH_SIZE at a time
+# and held as Arrow columns until a row group is full.
+EXPORT_ROW_GROUP_SIZE = 64 * STREAM_BATCH_SIZE
+
+
+class ExportError(ValueError):
+    pass
+
+
+def get_export_format(args) -> str:
+    export_format = args.get("format", "csv").lower()
+    if export_format not in EXPORT_MIMETYPES:
+        raise ExportError(f"format must be one of {', '.join(EXPORT_MIMETYPES)}")
+    if export_format in ARROW_FORMATS and pa is None:
+        raise ExportError(f"{export_format} export needs pyarrow installed")
+    return export_format
+
+
+# Lists of row tuples straight off the cursor
+def _batches(query, size: int):
+    rows = iter(query.yield_per(STREAM_BATCH_SIZE))
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _csv(query, fields: tuple):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for batch in _batches(query, STREAM_BATCH_SIZE):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Float):
+        return pa.float64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, String):
+        return pa.string()
+    raise ExportError(f"No Arrow type for {column.name}")
+
+
+def arrow_schema(model, fields: tuple):
+    return pa.schema([(f, _arrow_type(getattr(model, f))) for f in fields])
+
+
+# Column-wise record batch, no per-row dicts
+def _record_batch(batch: list, schema):
+    columns = zip(*batch)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+# Write-only file object whose contents are handed out as they are written
+class _Chunks(io.RawIOBase):
+    def __init__(self):
+        self.chunks = list()
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def take(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = list()
+        return data
+
+
+def _arrow(query, schema, export_format: str):
+    sink = _Chunks()
+    batches = (_record_batch(b, schema) for b in _batches(query, STREAM_BATCH_SIZE))
+    if export_format == "arrow":
+        writer = pa.ipc.new_stream(sink, schema)
+        for batch in batches:
+            writer.write_batch(batch)
+            yield sink.take()
+        writer.close()
+        yield sink.take()
+        return
+
+    writer = pq.ParquetWriter(sink, schema)
+    pending = list()
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= EXPORT_ROW_GROUP_SIZE:
+            writer.write_table(
+                pa.Table.from_batches(pending), row_group_size=EXPORT_ROW_GROUP_SIZE
+            )
+            pending = list()
+            pending_rows = 0
+            yield sink.take()
+    if pending:
+        writer.write_table(pa.Table.from_batches(pending))
+    writer.close()
+    yield sink.take()
+
+
+# Stream the query's rows (the fields columns of model, in order) as a
+# CSV, Parquet or Arrow IPC stream download
+def export_response(query, model, fields: tuple, export_format: str) -> Response:
+    if export_format == "csv":
+        body = _csv(query, fields)
+    else:
+        body = _arrow(query, arrow_schema(model, fields), export_format)
+    response = Response(
+        stream_with_context(body), mimetype=EXPORT_MIMETYPES[export_format]
+    )
+    filename = f"{model.__tablename__}.{export_format}"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
@@ -0,0 +1,144 @@
+import datetime
+from sqlalchemy import and_
+from DB.models import Person, PersonRollup
+
+# Query params compared with == against the column of the same name
+PERSON_EQUALITY_FILTERS = (
+    "age",
+    "city",
+    "flee_status",
+    "gender",
+    "location_precision",
+    "name",
+    "race",
+    "state",
+    "threat_type",
+)
+PERSON_BOOLEAN_FILTERS = ("body_camera", "was_mental_illness_related")
+
+# Filters person_rollup has no column for, stats fall back to the person table
+ROLLUP_UNSUPPORTED_FILTERS = (
+    "age",
+    "city",
+    "location_precision",
+    "name",
+    "from",
+    "to",
+)
+
+
+# Most ids one lookup resolves, they all go into a single IN clause
+MAX_LOOKUP_IDS = 5000
+
+
+class FilterError(ValueError):
+    pass
+
+
+def as_bool(value: str) -> bool:
+    return value.lower() in ("1", "true", "t", "yes", "y")
+
+
+def _year(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        raise FilterError("ldate and tdate must be years")
+
+
+def _day(value: str) -> datetime.date:
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise FilterError("from and to must be dates (YYYY-MM-DD)")
+
+
+# Ids are strings, or ints from a JSON body. bool is an int subclass, but
+# str(True) is no id.
+def is_scalar_id(value) -> bool:
+    return isinstance(value, (str, int)) and not isinstance(value, bool)
+
+
+# Requested ids as strings, duplicates dropped, in the order given
+def get_ids(values) -> list:
+    if not all(is_scalar_id(v) for v in values):
+        raise FilterError("ids must be strings or integers")
+    ids = list(dict.fromkeys(str(v) for v in values))
+    if len(ids) > MAX_LOOKUP_IDS:
+        raise FilterError(f"At most {MAX_LOOKUP_IDS} ids per request")
+    return ids
+
+
+def has_unsupported_rollup_filters(args) -> bool:
+    return any(args.get(param) for param in ROLLUP_UNSUPPORTED_FILTERS)
+
+
+# WHERE clauses for the /person/params query string
+def person_filters(args) -> list:
+    clauses = list()
+
+    for param in PERSON_EQUALITY_FILTERS:
+        value = args.get(param)
+        if value:
+            clauses.append(getattr(Person, param) == value)
+
+    for param in PERSON_BOOLEAN_FILTERS:
+        value = args.get(param)
+        if value:
+            clauses.append(getattr(Person, param) == as_bool(value))
+
+    armed_with = args.get("armed_with")
+    if armed_with == "armed":
+        clauses.append(Person.armed_with != "unarmed")
+    elif armed_with:
+        clauses.append(Person.armed_with == armed_with)
+
+    # whole years (ldate/tdate) or days (from/to), both inclusive
+    leading_date = args.get("ldate")
+    trailing_date = args.get("tdate")
+    if leading_date and trailing_date:
+        clauses.append(
+            Person.date.between(
+                datetime.date(_year(leading_date), 1, 1),
+                datetime.date(_year(trailing_date), 12, 31),
+            )
+        )
+    if args.get("from"):
+        clauses.append(Person.date >= _day(args.get("from")))
+    if args.get("to"):
+        clauses.append(Person.date <= _day(args.get("to")))
+    return clauses
+
+
+# The same filters against person_rollup, minus ROLLUP_UNSUPPORTED_FILTERS
+def rollup_filters(args) -> list:
+    clauses = list()
+
+    for param in PERSON_EQUALITY_FILTERS:
+        value = args.get(param)
+        if value and param not in ROLLUP_UNSUPPORTED_FILTERS:
+            clauses.append(getattr(PersonRollup, param) == value)
+
+    for param in PERSON_BOOLEAN_FILTERS:
+        value = args.get(param)
+        if value:
+            clauses.append(getattr(PersonRollup, param) == str(as_bool(value)))
+
+    armed_with = args.get("armed_with")
+    if armed_with == "armed":
+        # "" is an unknown value, which != "unarmed" excludes on person
+        clauses.append(
+            and_(PersonRollup.armed_with != "unarmed", PersonRollup.armed_with != "")
+        )
+    elif armed_with:
+        clauses.append(PersonRollup.armed_with == armed_with)
+
+    leading_date = args.get("ldate")
+    trailing_date = args.get("tdate")
+    if leading_date and trailing_date:
+        clauses.append(
+            PersonRollup.year.between(
+                f"{_year(leading_date):04d}", f"{_year(trailing_date):04d}"
+            )
+        )
+    return clauses
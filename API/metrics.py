@@ -0,0 +1,144 @@
+import logging
+import os
+import time
+from flask import current_app, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# With PROMETHEUS_MULTIPROC_DIR set (see config/shooting.ini) every uWSGI
+# process writes its samples there and /metrics sums them
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+# Statements slower than this are logged with their parameters
+SLOW_QUERY_SECONDS = 0.2
+# Longest parameters repr a slow query log line carries
+SLOW_QUERY_PARAMETERS_LENGTH = 500
+
+logger = logging.getLogger(__name__)
+
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "Time spent in the view, by route",
+    ["method", "route", "status"],
+)
+RESPONSE_SIZE = Histogram(
+    "api_response_size_bytes",
+    "Response body size as sent, by route",
+    ["method", "route"],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+DB_STATEMENTS = Histogram(
+    "api_db_statements_per_request",
+    "SQL statements executed per request, by route",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 500),
+)
+DB_TIME = Histogram(
+    "api_db_seconds_per_request",
+    "Cumulative SQL execution time per request, by route",
+    ["method", "route"],
+)
+SLOW_QUERIES = Counter(
+    "api_db_slow_queries_total",
+    "SQL statements slower than the slow query threshold, by route",
+    ["route"],
+)
+
+
+# URL rule rather than path, so /person/<id> is one series
+def route_label() -> str:
+    if request.url_rule is None:
+        return "unmatched"
+    return request.url_rule.rule
+
+
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+    g.db_statements = 0
+    g.db_seconds = 0.0
+
+
+# after_request hook, registered before compress_response so it runs after
+# it and sees the encoded size. Streamed bodies have no size yet and only
+# count the time to the first byte.
+def record_request_metrics(response):
+    started = g.get("metrics_started")
+    if started is None:
+        return response
+    route = route_label()
+    REQUEST_LATENCY.labels(request.method, route, response.status_code).observe(
+        time.perf_counter() - started
+    )
+    if response.content_length is not None:
+        RESPONSE_SIZE.labels(request.method, route).observe(response.content_length)
+    DB_STATEMENTS.labels(request.method, route).observe(g.db_statements)
+    DB_TIME.labels(request.method, route).observe(g.db_seconds)
+    return response
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("statement_started", list()).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - conn.info["statement_started"].pop()
+    route = None
+    if has_request_context() and "metrics_started" in g:
+        g.db_statements += 1
+        g.db_seconds += elapsed
+        route = route_label()
+
+    threshold = SLOW_QUERY_SECONDS
+    if has_request_context():
+        threshold = current_app.config.get("SLOW_QUERY_SECONDS", threshold)
+    if elapsed >= threshold:
+        SLOW_QUERIES.labels(route or "none").inc()
+        logger.warning(
+            "slow query (%.3fs, route %s): %s parameters=%s",
+            elapsed,
+            route,
+            statement,
+            describe_parameters(parameters, many),
+        )
+
+
+# executemany batches (bulk writes, syncs) carry every record, possibly with
+# personal data, so only the row count and the first row are logged
+def describe_parameters(parameters, many: bool) -> str:
+    if many and parameters:
+        description = f"{len(parameters)} rows, first {parameters[0]!r}"
+    else:
+        description = repr(parameters)
+    if len(description) > SLOW_QUERY_PARAMETERS_LENGTH:
+        description = description[:SLOW_QUERY_PARAMETERS_LENGTH] + "..."
+    return description
+
+
+# A failed statement never reaches after_cursor_execute
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context):
+    if context.connection is not None:
+        started = context.connection.info.get("statement_started")
+        if started:
+            started.pop()
+
+
+# Prometheus text exposition of this process, or of every worker in
+# multiprocess mode
+def render_metrics() -> tuple:
+    registry = REGISTRY
+    if os.environ.get(MULTIPROC_DIR_ENV):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
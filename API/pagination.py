@@ -0,0 +1,149 @@
+import base64
+import datetime
+import json
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+# Integer columns are 32-bit on Postgres
+INTEGER_RANGE = range(-(2**31), 2**31)
+
+# Columns each table can be keyset-paginated on (db_id is always the tiebreaker)
+PERSON_SORT_KEYS = ("db_id", "id", "date", "name", "state", "age")
+AGENCY_SORT_KEYS = ("db_id", "id", "name", "state", "total_shootings")
+
+
+class PaginationError(ValueError):
+    pass
+
+
+class Page:
+    def __init__(self, limit: int, sort: str, after: tuple = None):
+        self.limit = limit
+        self.sort = sort
+        # (sort value, db_id) of the last row of the previous page
+        self.after = after
+
+
+def encode_cursor(sort: str, value, db_id: int) -> str:
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    payload = json.dumps({"s": sort, "v": value, "k": db_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def is_integer(value) -> bool:
+    return (
+        isinstance(value, int)
+        and not isinstance(value, bool)
+        and value in INTEGER_RANGE
+    )
+
+
+# A cursor's sort value as the Python type of column. Cursors come back from
+# clients, anything else would reach the comparison and fail in the database.
+def cursor_value(value, column):
+    if value is None:
+        return None
+    python_type = column.type.python_type
+    if python_type is datetime.date and isinstance(value, str):
+        try:
+            return datetime.date.fromisoformat(value)
+        except ValueError:
+            pass
+    elif python_type is int and is_integer(value):
+        return value
+    elif python_type is str and isinstance(value, str):
+        return value
+    raise PaginationError("Invalid cursor")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        cursor_sort, value, db_id = payload["s"], payload["v"], payload["k"]
+    except (ValueError, TypeError, KeyError):
+        raise PaginationError("Invalid cursor")
+    if not is_integer(db_id):
+        raise PaginationError("Invalid cursor")
+    if cursor_sort != sort:
+        raise PaginationError("Cursor does not match sort parameter")
+    return value, db_id
+
+
+# Read limit/cursor/sort from the query string.
+# Returns None when the client did not ask for pagination.
+def get_page_params(args, sort_keys: tuple, model):
+    limit = args.get("limit")
+    cursor = args.get("cursor")
+    sort = args.get("sort", "db_id")
+
+    if limit is None and cursor is None:
+        if "sort" in args:
+            raise PaginationError("sort needs limit or cursor")
+        return None
+    if sort not in sort_keys:
+        raise PaginationError(
+            f"Cannot sort by {sort}, use one of {', '.join(sort_keys)}"
+        )
+
+    if limit is None:
+        limit = DEFAULT_PAGE_SIZE
+    else:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        if limit < 1:
+            raise PaginationError("limit must be positive")
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    after = None
+    if cursor:
+        value, db_id = decode_cursor(cursor, sort)
+        after = (cursor_value(value, getattr(model, sort)), db_id)
+    return Page(limit, sort, after)
+
+
+# Queries (each a Query or a select()) for the rows strictly after page.after
+# in (sort column NULLS LAST, db_id) order. Non-null values are read as a
+# (column, db_id) index range, the NULL tail as a second phase by db_id. Run
+# them in order, each limited to the rows still missing, until page.limit + 1
+# rows (the extra one tells whether another page follows) came back.
+def keyset_phases(query, model, page: Page) -> list:
+    key = model.db_id
+    if page.sort == "db_id":
+        if page.after:
+            query = query.filter(key > page.after[1])
+        return [query.order_by(key.asc())]
+
+    column = getattr(model, page.sort)
+    values = query.filter(column.isnot(None)).order_by(column.asc(), key.asc())
+    nulls = query.filter(column.is_(None)).order_by(key.asc())
+    if page.after is None:
+        return [values, nulls]
+    value, db_id = page.after
+    if value is None:
+        return [nulls.filter(key > db_id)]
+    return [values.filter(tuple_(column, key) > (value, db_id)), nulls]
+
+
+# Trim the extra row keyset_phases fetched. Returns (rows, next_cursor).
+def next_page(rows: list, page: Page):
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[: page.limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(page.sort, getattr(last, page.sort), last.db_id)
+    return rows, next_cursor
+
+
+# Apply keyset pagination to query. Returns (rows, next_cursor).
+def paginate(query, model, page: Page):
+    rows = list()
+    for phase in keyset_phases(query, model, page):
+        rows += phase.limit(page.limit + 1 - len(rows)).all()
+        if len(rows) > page.limit:
+            break
+    return next_page(rows, page)
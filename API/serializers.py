@@ -0,0 +1,112 @@
+import datetime
+from DB.models import Person, Agency
+
+# Public fields for each table, in response order
+PERSON_FIELDS = (
+    "db_id",
+    "id",
+    "name",
+    "date",
+    "body_camera",
+    "city",
+    "county",
+    "state",
+    "longitude",
+    "latitude",
+    "location_precision",
+    "age",
+    "gender",
+    "race",
+    "race_source",
+    "was_mental_illness_related",
+    "threat_type",
+    "armed_with",
+    "flee_status",
+    "agency_ids",
+)
+AGENCY_FIELDS = (
+    "db_id",
+    "id",
+    "name",
+    "type",
+    "state",
+    "oricodes",
+    "total_shootings",
+)
+
+MODEL_FIELDS = {Person: PERSON_FIELDS, Agency: AGENCY_FIELDS}
+
+# Related records a model's reads can embed with ?expand=
+MODEL_EXPANSIONS = {Person: ("agencies",), Agency: ()}
+
+# Fields sent and received as YYYY-MM-DD strings
+DATE_FIELDS = ("date",)
+
+
+class FieldError(ValueError):
+    pass
+
+
+# Read ?fields=a,b,c (or repeated fields=) from the query string.
+# Returns every public field of the model when none were requested.
+def get_fields(args, model) -> tuple:
+    allowed = MODEL_FIELDS[model]
+    requested = list()
+    for value in args.getlist("fields"):
+        requested.extend(f.strip() for f in value.split(",") if f.strip())
+
+    if not requested:
+        return allowed
+
+    unknown = [f for f in requested if f not in allowed]
+    if unknown:
+        raise FieldError(f"Unknown fields: {', '.join(unknown)}")
+    # drop duplicates, keep the order the client asked for
+    return tuple(dict.fromkeys(requested))
+
+
+# Read ?expand=a,b from the query string, () when nothing was requested
+def get_expand(args, model) -> tuple:
+    allowed = MODEL_EXPANSIONS[model]
+    requested = list()
+    for value in args.getlist("expand"):
+        requested.extend(e.strip() for e in value.split(",") if e.strip())
+
+    unknown = [e for e in requested if e not in allowed]
+    if unknown:
+        raise FieldError(f"Cannot expand {', '.join(unknown)}")
+    return tuple(dict.fromkeys(requested))
+
+
+# Columns to SELECT for fields. extra columns (e.g. the pagination keys) are
+# appended after the requested ones so they never leak into the response.
+def select_columns(model, fields: tuple, extra: tuple = ()) -> list:
+    names = list(fields) + [f for f in extra if f not in fields]
+    return [getattr(model, name) for name in names]
+
+
+# Build a row -> dict function for plain (non-ORM) result rows whose first
+# columns are fields, in order
+def row_serializer(fields: tuple):
+    date_fields = [f for f in fields if f in DATE_FIELDS]
+
+    def serialize(row) -> dict:
+        return dict(zip(fields, row))
+
+    def serialize_dates(row) -> dict:
+        data = dict(zip(fields, row))
+        for field in date_fields:
+            if data[field] is not None:
+                data[field] = data[field].isoformat()
+        return data
+
+    return serialize_dates if date_fields else serialize
+
+
+# YYYY-MM-DD (or None/"") from a request body -> datetime.date
+def parse_date(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value)[:10])
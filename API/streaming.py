@@ -0,0 +1,57 @@
+from flask import Response, current_app, request, stream_with_context
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+# Rows fetched per round-trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+
+def _accepts_ndjson() -> bool:
+    best = request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+
+# Stream when asked with ?stream=1 or Accept: application/x-ndjson
+def wants_stream() -> bool:
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return _accepts_ndjson()
+
+
+def _batches(rows, serialize):
+    batch = list()
+    for row in rows:
+        batch.append(current_app.json.dumps(serialize(row)))
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield batch
+            batch = list()
+    if batch:
+        yield batch
+
+
+def _ndjson(rows, serialize):
+    for batch in _batches(rows, serialize):
+        yield "\n".join(batch) + "\n"
+
+
+# Same {key: [...]} envelope as the buffered views, sent in chunks
+def _json_array(rows, serialize, key: str):
+    yield '{"%s":[' % key
+    first = True
+    for batch in _batches(rows, serialize):
+        yield ("" if first else ",") + ",".join(batch)
+        first = False
+    yield "]}"
+
+
+# Stream query results without materializing the whole table.
+# yield_per makes SQLAlchemy use a server-side cursor on Postgres.
+def stream_response(query, serialize, key: str) -> Response:
+    rows = query.yield_per(STREAM_BATCH_SIZE)
+    if _accepts_ndjson():
+        body = _ndjson(rows, serialize)
+        mimetype = NDJSON_MIMETYPE
+    else:
+        body = _json_array(rows, serialize, key)
+        mimetype = "application/json"
+    return Response(stream_with_context(body), mimetype=mimetype)
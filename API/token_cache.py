@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Each uWSGI worker keeps its own cache, so a promoted/deleted user is seen
+# by other workers after at most TOKEN_CACHE_TTL seconds
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TTL = 60
+
+
+# Snapshot of the Users columns the views need. ORM instances can't be shared
+# between requests because they are bound to the request's session.
+class CachedUser:
+    def __init__(self, user):
+        self.id = user.id
+        self.public_id = user.public_id
+        self.name = user.name
+        self.admin = user.admin
+
+
+# Bounded LRU of token -> CachedUser, entries expire after ttl seconds or at
+# the token's own exp, whichever comes first
+class TokenCache:
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+
+    def set(self, token: str, user: CachedUser, exp: float = None):
+        expires = time.time() + self.ttl
+        if exp is not None:
+            expires = min(expires, exp)
+        with self._lock:
+            self._entries[token] = (user, expires)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    # Drop every cached token belonging to public_id
+    def invalidate_user(self, public_id: str):
+        with self._lock:
+            stale = [
+                token
+                for token, (user, _) in self._entries.items()
+                if user.public_id == public_id
+            ]
+            for token in stale:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache()
@@ -1,12 +1,87 @@
-from flask import request, jsonify, make_response, render_template
+from flask import (
+    Blueprint,
+    current_app,
+    request,
+    jsonify,
+    make_response,
+    render_template,
+)
 import uuid
 from werkzeug.security import generate_password_hash, check_password_hash
 import datetime
+import json
 import jwt
 from functools import wraps
-from API.app import app, db
-from DB.models import Users, Person, Agency
-from sqlalchemy import Date, cast
+from DB.models import db, Users, ApiKey, Person, Agency, PersonAgency, PersonRollup
+import heapq
+from collections import Counter, defaultdict
+from sqlalchemy import desc, func
+from sqlalchemy.exc import SQLAlchemyError
+from API.pagination import (
+    MAX_PAGE_SIZE,
+    PaginationError,
+    get_page_params,
+    paginate,
+    PERSON_SORT_KEYS,
+    AGENCY_SORT_KEYS,
+)
+from API.streaming import wants_stream, stream_response, NDJSON_MIMETYPE
+from API.serializers import (
+    FieldError,
+    get_fields,
+    get_expand,
+    select_columns,
+    row_serializer,
+    parse_date,
+    DATE_FIELDS,
+    PERSON_FIELDS,
+    AGENCY_FIELDS,
+)
+from API.token_cache import CachedUser, token_cache
+from API.api_keys import (
+    API_KEY_PREFIX_LENGTH,
+    api_key_cache,
+    generate_api_key,
+    hash_api_key,
+    verify_api_key,
+)
+from API.conditional import conditional_get
+from API.export import ExportError, export_response, get_export_format
+from API.metrics import render_metrics
+from DB.versioning import bump_version
+from DB.bulk import BulkError, chunks, existing_ids, upsert, delete_ids
+from DB.rollups import (
+    ROLLUP_DIMENSIONS,
+    apply_deltas,
+    bulk_deltas,
+    count_person,
+    dimension_expressions,
+    dimension_output,
+    rebuild_rollup,
+    rollup_key,
+)
+from DB.geo import grid_cell, grid_cell_filter, radius_bounds, haversine_km
+from DB.search import search_names
+from DB.routing import read_only
+from DB.links import (
+    apply_agency_deltas,
+    linked_agencies,
+    rebuild_links,
+    reconcile_agency_counts,
+    remove_person_agencies,
+    set_person_agencies,
+    split_agency_ids,
+)
+from API.filters import (
+    FilterError,
+    get_ids,
+    is_scalar_id,
+    person_filters,
+    rollup_filters,
+    has_unsupported_rollup_filters,
+)
+
+api = Blueprint("api", __name__, cli_group=None)
 
 
 # Create token required decorator
@@ -15,17 +90,37 @@ def token_required(f):
     def decorated(*args, **kwargs):
         token = None
 
+        # service accounts send a long-lived API key instead of a JWT
+        api_key = request.headers.get("x-api-key")
+        if api_key:
+            current_user = verify_api_key(
+                db.session, api_key, current_app.config["SECRET_KEY"]
+            )
+            if current_user is None:
+                return jsonify({"message": "API key is invalid!"}), 401
+            return f(current_user, *args, **kwargs)
+
         if "x-access-token" in request.headers:
             token = request.headers["x-access-token"]
 
         if not token:
             return jsonify({"message": "Token is missing!"}), 401
 
-        try:
-            data = jwt.decode(token, app.config["SECRET_KEY"], algorithms="HS256")
-            current_user = Users.query.filter_by(public_id=data["public_id"]).first()
-        except:
-            return jsonify({"message": "Token is invalid!"}), 401
+        # skip decode + user lookup for tokens verified recently
+        current_user = token_cache.get(token)
+        if current_user is None:
+            try:
+                data = jwt.decode(
+                    token, current_app.config["SECRET_KEY"], algorithms="HS256"
+                )
+                user = Users.query.filter_by(public_id=data["public_id"]).first()
+            except:
+                return jsonify({"message": "Token is invalid!"}), 401
+
+            if not user:
+                return jsonify({"message": "Token is invalid!"}), 401
+            current_user = CachedUser(user)
+            token_cache.set(token, current_user, data.get("exp"))
 
         return f(current_user, *args, **kwargs)
 
@@ -35,162 +130,266 @@ def token_required(f):
 ##############################################################################
 # Person Views
 ##############################################################################
+# ?expand=agencies: attach each person's agencies (from person_agency) to
+# output, one joined query per chunk of person ids
+def embed_agencies(person_ids: list, output: list):
+    serialize = row_serializer(AGENCY_FIELDS)
+    agencies = defaultdict(list)
+    columns = select_columns(Agency, AGENCY_FIELDS)
+    for chunk in chunks(list(set(person_ids))):
+        for row in db.session.execute(linked_agencies(chunk, columns)):
+            agencies[row[0]].append(serialize(row[1:]))
+    for person_id, person_data in zip(person_ids, output):
+        person_data["agencies"] = agencies.get(person_id, list())
+
 
 # Return all people in database
-@app.route("/person", methods=["GET"])
+# Pass limit (and the returned next_cursor) to page through the table,
+# or ?stream=1 / Accept: application/x-ndjson to stream the whole table
+@api.route("/person", methods=["GET"])
 @token_required
+@conditional_get("person", expand={"agencies": "agency"})
 def get_all_people(current_user):
-    people = Person.query.all()
+    try:
+        page = get_page_params(request.args, PERSON_SORT_KEYS, Person)
+        fields = get_fields(request.args, Person)
+        expand = get_expand(request.args, Person)
+    except (PaginationError, FieldError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    serialize = row_serializer(fields)
+    next_cursor = None
+    if page:
+        columns = select_columns(Person, fields, extra=(page.sort, "db_id", "id"))
+        people, next_cursor = paginate(db.session.query(*columns), Person, page)
+    else:
+        people = db.session.query(*select_columns(Person, fields, extra=("id",)))
+        if wants_stream() and not expand:
+            return stream_response(people.order_by(Person.db_id), serialize, "people")
     output = list()
+    person_ids = list()
 
     for person in people:
-        person_data = dict()
-
-        person_data["db_id"] = person.db_id
-        person_data["id"] = person.id
-        person_data["name"] = person.name
-        person_data["date"] = person.date
-        person_data["body_camera"] = person.body_camera
-        person_data["city"] = person.city
-        person_data["county"] = person.county
-        person_data["state"] = person.state
-        person_data["longitude"] = person.longitude
-        person_data["latitude"] = person.latitude
-        person_data["location_precision"] = person.location_precision
-        person_data["age"] = person.age
-        person_data["gender"] = person.gender
-        person_data["race"] = person.race
-        person_data["race_source"] = person.race_source
-        person_data["was_mental_illness_related"] = person.was_mental_illness_related
-        person_data["threat_type"] = person.threat_type
-        person_data["armed_with"] = person.armed_with
-        person_data["flee_status"] = person.flee_status
-        person_data["agency_ids"] = person.agency_ids
-
-        output.append(person_data)
+        output.append(serialize(person))
+        person_ids.append(person.id)
+    if "agencies" in expand:
+        embed_agencies(person_ids, output)
+    if page:
+        return jsonify({"people": output, "next_cursor": next_cursor})
     return jsonify({"people": output})
 
 
 # Return person based on public ID
-@app.route("/person/<id>", methods=["GET"])
+@api.route("/person/<id>", methods=["GET"])
 @token_required
+@conditional_get("person", expand={"agencies": "agency"})
 def get_person(current_user, id):
-    person = Person.query.filter_by(id=id).first()
+    try:
+        fields = get_fields(request.args, Person)
+        expand = get_expand(request.args, Person)
+    except FieldError as e:
+        return jsonify({"message": str(e)}), 400
+
+    person = (
+        db.session.query(*select_columns(Person, fields))
+        .filter(Person.id == id)
+        .first()
+    )
 
     if not person:
         return jsonify({"message": "No person found with this id"})
 
-    person_data = dict()
-    person_data["db_id"] = person.db_id
-    person_data["id"] = person.id
-    person_data["name"] = person.name
-    person_data["date"] = person.date
-    person_data["body_camera"] = person.body_camera
-    person_data["city"] = person.city
-    person_data["county"] = person.county
-    person_data["state"] = person.state
-    person_data["longitude"] = person.longitude
-    person_data["latitude"] = person.latitude
-    person_data["location_precision"] = person.location_precision
-    person_data["age"] = person.age
-    person_data["gender"] = person.gender
-    person_data["race"] = person.race
-    person_data["race_source"] = person.race_source
-    person_data["was_mental_illness_related"] = person.was_mental_illness_related
-    person_data["threat_type"] = person.threat_type
-    person_data["armed_with"] = person.armed_with
-    person_data["flee_status"] = person.flee_status
-    person_data["agency_ids"] = person.agency_ids
-
+    person_data = row_serializer(fields)(person)
+    if "agencies" in expand:
+        embed_agencies([id], [person_data])
     return jsonify({"people": person_data})
 
 
 # parameterized query
-@app.route("/person/params", methods=["GET"])
+@api.route("/person/params", methods=["GET"])
 @token_required
+@conditional_get("person", expand={"agencies": "agency"})
 def get_person_parameterized(current_user):
-
-    age = request.args.get("age")
-    armed_with = request.args.get("armed_with")
-    body_camera = request.args.get("body_camera")
-    city = request.args.get("city")
-    leading_date = request.args.get("ldate")
-    trailing_date = request.args.get("tdate")
-    flee_status = request.args.get("flee_status")
-    gender = request.args.get("gender")
-    location_precision = request.args.get("location_precision")
-    name = request.args.get("name")
-    race = request.args.get("race")
-    was_mental_illness_related = request.args.get("was_mental_illness_related")
-    state = request.args.get("state")
-    threat_type = request.args.get("threat_type")
-
-    people = Person.query.filter()
-
-    if age:
-        people = people.filter(Person.age == age)
-    if armed_with == "unarmed":
-        people = people.filter(Person.armed == armed_with)
-    if armed_with == "armed":
-        people = people.filter(Person.armed != "unarmed")
-    if body_camera:
-        people = people.filter(Person.body_camera == bool(body_camera))
-    if city:
-        people = people.filter(Person.city == city)
-    if leading_date and trailing_date:
-        people = people.filter(cast(Person.date, Date).between(datetime.date(int(leading_date), 1, 1), datetime.date(int(trailing_date), 12, 31)))
-    if flee_status:
-        if flee_status == 'Not fleeing':
-            people = people.filter(Person.flee == flee_status)
-    if gender:
-        people = people.filter(Person.gender == gender)
-    if location_precision:
-        people = people.filter(Person.is_geocoding_exact == bool(location_precision))
-    if name:
-        people = people.filter(Person.name == name)
-    if race:
-        people = people.filter(Person.race == race)
-    if was_mental_illness_related:
-        people = people.filter(
-            Person.signs_of_mental_illness == bool(was_mental_illness_related)
-        )
-    if state:
-        people = people.filter(Person.state == state)
-    if threat_type:
-        people = people.filter(Person.threat_level == threat_type)
+    try:
+        fields = get_fields(request.args, Person)
+        expand = get_expand(request.args, Person)
+        clauses = person_filters(request.args)
+        id_list = get_ids(request.args.getlist("id"))
+    except (FieldError, FilterError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    columns = select_columns(Person, fields, extra=("id",))
+    people = db.session.query(*columns).filter(*clauses)
+    if id_list:
+        people = people.filter(Person.id.in_(id_list))
 
     if not people:
         return jsonify({"message": "No person found with this id"})
+    serialize = row_serializer(fields)
+    if wants_stream() and not expand:
+        return stream_response(people, serialize, "people")
     output = list()
+    person_ids = list()
 
     for person in people:
-        person_data = dict()
-        person_data["db_id"] = person.db_id
-        person_data["id"] = person.id
-        person_data["name"] = person.name
-        person_data["date"] = person.date
-        person_data["body_camera"] = person.body_camera
-        person_data["city"] = person.city
-        person_data["county"] = person.county
-        person_data["state"] = person.state
-        person_data["longitude"] = person.longitude
-        person_data["latitude"] = person.latitude
-        person_data["location_precision"] = person.location_precision
-        person_data["age"] = person.age
-        person_data["gender"] = person.gender
-        person_data["race"] = person.race
-        person_data["race_source"] = person.race_source
-        person_data["was_mental_illness_related"] = person.was_mental_illness_related
-        person_data["threat_type"] = person.threat_type
-        person_data["armed_with"] = person.armed_with
-        person_data["flee_status"] = person.flee_status
-        person_data["agency_ids"] = person.agency_ids
+        output.append(serialize(person))
+        person_ids.append(person.id)
+    if "agencies" in expand:
+        embed_agencies(person_ids, output)
+    return jsonify({"people": output})
 
+
+# Look up to MAX_LOOKUP_IDS people in one query. Body: {"ids": [...]},
+# fields and expand are query params as on the GET views. People come back
+# in the order asked for, ids that matched nobody are listed in "missing".
+@api.route("/person/batch", methods=["POST"])
+@token_required
+@read_only
+def get_people_batch(current_user):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("ids"), list):
+        return jsonify({"message": "Expected a JSON object with an ids list"}), 400
+    try:
+        fields = get_fields(request.args, Person)
+        expand = get_expand(request.args, Person)
+        id_list = get_ids(data["ids"])
+    except (FieldError, FilterError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    serialize = row_serializer(fields)
+    found = dict()
+    if id_list:
+        columns = select_columns(Person, fields, extra=("id",))
+        people = db.session.query(*columns).filter(Person.id.in_(id_list))
+        for person in people:
+            found[person.id] = serialize(person)
+
+    person_ids = [i for i in id_list if i in found]
+    output = [found[i] for i in person_ids]
+    if "agencies" in expand:
+        embed_agencies(person_ids, output)
+    missing = [i for i in id_list if i not in found]
+    return jsonify({"people": output, "missing": missing})
+
+
+# People inside the box, nearest to (center_lat, center_lon) first.
+# The grid_cell ranges let the index skip everything outside the box.
+def people_near(fields, bounds: tuple, center_lat, center_lon, radius_km=None):
+    try:
+        limit = min(int(request.args.get("limit", MAX_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+
+    south, west, north, east = bounds
+    columns = select_columns(Person, fields, extra=("latitude", "longitude"))
+    people = db.session.query(*columns).filter(
+        Person.latitude.between(south, north), Person.longitude.between(west, east)
+    )
+    cells = grid_cell_filter(Person.grid_cell, south, west, north, east)
+    if cells is not None:
+        people = people.filter(cells)
+
+    matches = list()
+    for person in people:
+        distance = haversine_km(
+            center_lat, center_lon, person.latitude, person.longitude
+        )
+        if radius_km is None or distance <= radius_km:
+            matches.append((distance, person))
+
+    serialize = row_serializer(fields)
+    output = list()
+    for distance, person in heapq.nsmallest(limit, matches, key=lambda m: m[0]):
+        person_data = serialize(person)
+        person_data["distance_km"] = round(distance, 3)
         output.append(person_data)
     return jsonify({"people": output})
 
 
-@app.route("/person/<id>", methods=["PUT"])
+def get_float_args(*names) -> list:
+    values = list()
+    for name in names:
+        try:
+            values.append(float(request.args[name]))
+        except (KeyError, ValueError):
+            raise FilterError(f"{', '.join(names)} are required numbers")
+    return values
+
+
+# Name search: prefix matches first, then typo-tolerant trigram matches,
+# best first. ?limit= defaults to 20, at most SEARCH_MAX_RESULTS.
+SEARCH_MAX_RESULTS = 100
+
+
+@api.route("/person/search", methods=["GET"])
+@token_required
+@conditional_get("person")
+def search_people(current_user):
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"message": "q is required"}), 400
+    try:
+        fields = get_fields(request.args, Person)
+        limit = min(int(request.args.get("limit", 20)), SEARCH_MAX_RESULTS)
+    except FieldError as e:
+        return jsonify({"message": str(e)}), 400
+    except ValueError:
+        return jsonify({"message": "limit must be an integer"}), 400
+
+    matches = search_names(db.session, query, limit)
+    columns = select_columns(Person, fields, extra=("db_id",))
+    people = db.session.query(*columns).filter(
+        Person.db_id.in_([db_id for db_id, _ in matches])
+    )
+    by_db_id = {person.db_id: person for person in people}
+
+    serialize = row_serializer(fields)
+    output = list()
+    for db_id, score in matches:
+        if db_id in by_db_id:
+            person_data = serialize(by_db_id[db_id])
+            person_data["score"] = round(score, 3)
+            output.append(person_data)
+    return jsonify({"people": output})
+
+
+# People within radius_km of lat/lon, nearest first
+@api.route("/person/near", methods=["GET"])
+@token_required
+@conditional_get("person")
+def get_people_near(current_user):
+    try:
+        fields = get_fields(request.args, Person)
+        lat, lon = get_float_args("lat", "lon")
+        radius_km = float(request.args.get("radius_km", 10))
+    except (FieldError, FilterError, ValueError) as e:
+        return jsonify({"message": str(e)}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or radius_km <= 0:
+        message = "lat/lon out of range or radius_km not positive"
+        return jsonify({"message": message}), 400
+
+    bounds = radius_bounds(lat, lon, radius_km)
+    return people_near(fields, bounds, lat, lon, radius_km)
+
+
+# People inside south/west/north/east, nearest to the box center first
+@api.route("/person/bbox", methods=["GET"])
+@token_required
+@conditional_get("person")
+def get_people_in_bbox(current_user):
+    try:
+        fields = get_fields(request.args, Person)
+        south, west, north, east = get_float_args("south", "west", "north", "east")
+    except (FieldError, FilterError) as e:
+        return jsonify({"message": str(e)}), 400
+    if south > north or west > east:
+        return jsonify({"message": "south must be <= north and west <= east"}), 400
+
+    bounds = (south, west, north, east)
+    return people_near(fields, bounds, (south + north) / 2, (west + east) / 2)
+
+
+@api.route("/person/<id>", methods=["PUT"])
 @token_required
 def update_person(current_user, id):
     if not current_user.admin:
@@ -199,10 +398,15 @@ def update_person(current_user, id):
     if not person:
         return jsonify({"message": "person not found"})
     data = request.get_json()
+    try:
+        date = parse_date(data["date"])
+    except ValueError:
+        return jsonify({"message": "date must be YYYY-MM-DD"}), 400
+    old_rollup_key = rollup_key(person)
     updated_person = Person(
         id=str(data["id"]),
         name=data["name"],
-        date=data["date"],
+        date=date,
         body_camera=data["body_camera"],
         city=data["city"],
         county=data["county"],
@@ -238,24 +442,37 @@ def update_person(current_user, id):
     person.armed_with = updated_person.armed_with
     person.flee_status = updated_person.flee_status
     person.agency_ids = updated_person.agency_ids
-
+    person.grid_cell = grid_cell(person.latitude, person.longitude)
+    links = {person.id: split_agency_ids(person.agency_ids)}
+    if apply_agency_deltas(db.session, set_person_agencies(db.session, links)):
+        bump_version(db.session, "agency")
+
+    deltas = Counter()
+    deltas[old_rollup_key] -= 1
+    deltas[rollup_key(person)] += 1
+    apply_deltas(db.session, deltas)
+    bump_version(db.session, "person")
     db.session.commit()
     return jsonify({"message": f"Person record {id} updated."})
 
 
 # Add person to database
 # Admin == True REQUIRED
-@app.route("/person", methods=["POST"])
+@api.route("/person", methods=["POST"])
 @token_required
 def add_person(current_user):
     if not current_user.admin:
         return jsonify({"message": "Cannot perform that function."})
 
     data = request.get_json()
+    try:
+        date = parse_date(data["date"])
+    except ValueError:
+        return jsonify({"message": "date must be YYYY-MM-DD"}), 400
     new_person = Person(
         id=str(data["id"]),
         name=data["name"],
-        date=data["date"],
+        date=date,
         body_camera=data["body_camera"],
         city=data["city"],
         county=data["county"],
@@ -273,12 +490,19 @@ def add_person(current_user):
         flee_status=data["flee_status"],
         agency_ids=data["agency_ids"],
     )
+    new_person.grid_cell = grid_cell(new_person.latitude, new_person.longitude)
     db.session.add(new_person)
+    db.session.flush()
+    links = {new_person.id: split_agency_ids(new_person.agency_ids)}
+    if apply_agency_deltas(db.session, set_person_agencies(db.session, links)):
+        bump_version(db.session, "agency")
+    count_person(db.session, new_person, 1)
+    bump_version(db.session, "person")
     db.session.commit()
     return jsonify({"message": "New person added to database."})
 
 
-@app.route("/person/<id>", methods=["DELETE"])
+@api.route("/person/<id>", methods=["DELETE"])
 @token_required
 def delete_person(current_user, id):
     if not current_user.admin:
@@ -287,7 +511,11 @@ def delete_person(current_user, id):
     person = Person.query.filter_by(id=id).first()
     if not person:
         return jsonify({"message": "No person found"})
+    if apply_agency_deltas(db.session, remove_person_agencies(db.session, [id])):
+        bump_version(db.session, "agency")
     db.session.delete(person)
+    count_person(db.session, person, -1)
+    bump_version(db.session, "person")
     db.session.commit()
     return jsonify({"message": "Person removed"})
 
@@ -296,79 +524,114 @@ def delete_person(current_user, id):
 # Agency Views
 #############################################################################################
 # Return all agencies in database
-@app.route("/agency", methods=["GET"])
+# Pass limit (and the returned next_cursor) to page through the table,
+# or ?stream=1 / Accept: application/x-ndjson to stream the whole table
+@api.route("/agency", methods=["GET"])
 @token_required
+@conditional_get("agency")
 def get_all_agencies(current_user):
-    agencies = Agency.query.all()
+    try:
+        page = get_page_params(request.args, AGENCY_SORT_KEYS, Agency)
+        fields = get_fields(request.args, Agency)
+    except (PaginationError, FieldError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    serialize = row_serializer(fields)
+    next_cursor = None
+    if page:
+        columns = select_columns(Agency, fields, extra=(page.sort, "db_id"))
+        agencies, next_cursor = paginate(db.session.query(*columns), Agency, page)
+    else:
+        agencies = db.session.query(*select_columns(Agency, fields))
+        if wants_stream():
+            return stream_response(
+                agencies.order_by(Agency.db_id), serialize, "agencies"
+            )
     output = list()
 
     for agency in agencies:
-        agency_data = dict()
-
-        agency_data["db_id"] = agency.db_id
-        agency_data["id"] = agency.id
-        agency_data["name"] = agency.name
-        agency_data["type"] = agency.type
-        agency_data["state"] = agency.state
-        agency_data["oricodes"] = agency.oricodes
-        agency_data["total_shootings"] = agency.total_shootings
-
-        output.append(agency_data)
+        output.append(serialize(agency))
+    if page:
+        return jsonify({"agencies": output, "next_cursor": next_cursor})
     return jsonify({"agencies": output})
 
 
 # Return agency based on public ID
-@app.route("/agency/<id>", methods=["GET"])
+@api.route("/agency/<id>", methods=["GET"])
 @token_required
+@conditional_get("agency")
 def get_agency(current_user, id):
-    agency = Agency.query.filter_by(id=id).first()
+    try:
+        fields = get_fields(request.args, Agency)
+    except FieldError as e:
+        return jsonify({"message": str(e)}), 400
+
+    agency = (
+        db.session.query(*select_columns(Agency, fields))
+        .filter(Agency.id == id)
+        .first()
+    )
 
     if not agency:
         return jsonify({"message": "No agency found with this id"})
 
-    agency_data = dict()
+    agency_data = row_serializer(fields)(agency)
+    return jsonify({"agencies": agency_data})
+
 
-    agency_data["db_id"] = agency.db_id
-    agency_data["id"] = agency.id
-    agency_data["name"] = agency.name
-    agency_data["type"] = agency.type
-    agency_data["state"] = agency.state
-    agency_data["oricodes"] = agency.oricodes
-    agency_data["total_shootings"] = agency.total_shootings
+# People involving agency <id>, through person_agency
+@api.route("/agency/<id>/people", methods=["GET"])
+@token_required
+@conditional_get("person")
+def get_agency_people(current_user, id):
+    try:
+        fields = get_fields(request.args, Person)
+    except FieldError as e:
+        return jsonify({"message": str(e)}), 400
+
+    people = (
+        db.session.query(*select_columns(Person, fields))
+        .join(PersonAgency, PersonAgency.person_id == Person.id)
+        .filter(PersonAgency.agency_id == id)
+        .order_by(Person.db_id)
+    )
+    serialize = row_serializer(fields)
+    if wants_stream():
+        return stream_response(people, serialize, "people")
+    output = list()
 
-    return jsonify({"agencies": agency_data})
+    for person in people:
+        output.append(serialize(person))
+    return jsonify({"people": output})
 
 
 # parameterized query
-@app.route("/agency/params", methods=["GET"])
+@api.route("/agency/params", methods=["GET"])
 @token_required
+@conditional_get("agency")
 def get_agency_parameterized(current_user):
+    try:
+        fields = get_fields(request.args, Agency)
+    except FieldError as e:
+        return jsonify({"message": str(e)}), 400
+
     id_list = request.args.getlist("id")
 
-    agencies = Agency.query.filter()
+    agencies = db.session.query(*select_columns(Agency, fields))
 
     if id_list:
         agencies = agencies.filter(Agency.id.in_(id_list))
 
     output = list()
 
+    serialize = row_serializer(fields)
     for agency in agencies:
-        agency_data = dict()
-
-        agency_data["db_id"] = agency.db_id
-        agency_data["id"] = agency.id
-        agency_data["name"] = agency.name
-        agency_data["type"] = agency.type
-        agency_data["state"] = agency.state
-        agency_data["oricodes"] = agency.oricodes
-        agency_data["total_shootings"] = agency.total_shootings
-
-        output.append(agency_data)
+        output.append(serialize(agency))
 
     return jsonify({"agencies": output})
 
 
-@app.route("/agency/<id>", methods=["PUT"])
+@api.route("/agency/<id>", methods=["PUT"])
 @token_required
 def update_agency(current_user, id):
     if not current_user.admin:
@@ -384,21 +647,20 @@ def update_agency(current_user, id):
         type=data["type"],
         state=data["state"],
         oricodes=data["oricodes"],
-        total_shootings=data["total_shootings"]
     )
     agency.name = updated_agency.name
     agency.type = updated_agency.type
     agency.state = updated_agency.state
     agency.oricodes = updated_agency.oricodes
-    agency.total_shootings = updated_agency.total_shootings
 
+    bump_version(db.session, "agency")
     db.session.commit()
     return jsonify({"message": f"Agency record {id} updated."})
 
 
 # Add person to database
 # Admin == True REQUIRED
-@app.route("/agency", methods=["POST"])
+@api.route("/agency", methods=["POST"])
 @token_required
 def add_agency(current_user):
     if not current_user.admin:
@@ -411,16 +673,18 @@ def add_agency(current_user):
         type=data["type"],
         state=data["state"],
         oricodes=data["oricodes"],
-        total_shootings=data["total_shootings"]
     )
 
     db.session.add(new_agency)
+    db.session.flush()
+    reconcile_agency_counts(db.session, [new_agency.id])
+    bump_version(db.session, "agency")
     db.session.commit()
 
     return jsonify({"message": "New agency added to database."})
 
 
-@app.route("/agency/<id>", methods=["DELETE"])
+@api.route("/agency/<id>", methods=["DELETE"])
 @token_required
 def delete_agency(current_user, id):
     if not current_user.admin:
@@ -430,14 +694,252 @@ def delete_agency(current_user, id):
     if not agency:
         return jsonify({"message": "No agency found"})
     db.session.delete(agency)
+    bump_version(db.session, "agency")
     db.session.commit()
     return jsonify({"message": "Agency removed"})
 
 
+#############################################################################################
+# Bulk Views
+#############################################################################################
+# Body is a JSON array or NDJSON lines of records. Records are upserted unless
+# they carry "op": "delete", in which case only "id" is needed.
+def get_bulk_items() -> list:
+    if request.mimetype == NDJSON_MIMETYPE:
+        lines = request.get_data(as_text=True).splitlines()
+        return [json.loads(line) for line in lines if line.strip()]
+    # None for a malformed body, reported like any other non-array
+    return request.get_json(silent=True)
+
+
+# Apply a bulk body to model's table in a single transaction
+def bulk_sync(model, table_name: str, fields: tuple):
+    try:
+        items = get_bulk_items()
+    except ValueError:
+        return jsonify({"message": "Body must be a JSON array or NDJSON."}), 400
+    if not isinstance(items, list):
+        return jsonify({"message": "Body must be a JSON array or NDJSON."}), 400
+
+    # total_shootings is maintained from person_agency, not taken from clients
+    columns = tuple(f for f in fields if f not in ("db_id", "total_shootings"))
+    id_length = model.id.type.length
+    results = list()
+    # last op per id wins, earlier ones are reported as superseded
+    final = dict()
+    for index, item in enumerate(items):
+        op = item.get("op", "upsert") if isinstance(item, dict) else None
+        record_id = item.get("id") if op else None
+        if (
+            op not in ("upsert", "delete")
+            or not is_scalar_id(record_id)
+            or not 0 < len(str(record_id)) <= id_length
+            # upserts replace the whole record, like PUT they need every field
+            or (op == "upsert" and any(c not in item for c in columns))
+        ):
+            results.append({"index": index, "status": "invalid"})
+            continue
+        record_id = str(record_id)
+        if record_id in final:
+            results[final[record_id][0]]["status"] = "superseded"
+        final[record_id] = (len(results), op, item)
+        results.append({"id": record_id, "op": op, "status": None})
+
+    existing = existing_ids(db.session, model, list(final))
+    upserts = list()
+    deletes = list()
+    for record_id, (index, op, item) in final.items():
+        if op == "delete":
+            if record_id in existing:
+                deletes.append(record_id)
+                results[index]["status"] = "deleted"
+            else:
+                results[index]["status"] = "not found"
+        else:
+            record = {c: item[c] for c in columns}
+            record["id"] = record_id
+            try:
+                for field in DATE_FIELDS:
+                    if field in record:
+                        record[field] = parse_date(record[field])
+            except ValueError:
+                results[index]["status"] = "invalid"
+                continue
+            if model is Person:
+                record["grid_cell"] = grid_cell(record["latitude"], record["longitude"])
+            upserts.append(record)
+            results[index]["status"] = (
+                "updated" if record_id in existing else "inserted"
+            )
+
+    try:
+        if model is Person:
+            replaced = [r["id"] for r in upserts if r["id"] in existing] + deletes
+            deltas = bulk_deltas(db.session, upserts, replaced)
+            columns += ("grid_cell",)
+        upsert(db.session, model, upserts, columns)
+        if model is Person:
+            links = {r["id"]: split_agency_ids(r["agency_ids"]) for r in upserts}
+            agency_deltas = set_person_agencies(db.session, links)
+            agency_deltas.update(remove_person_agencies(db.session, deletes))
+            if apply_agency_deltas(db.session, agency_deltas):
+                bump_version(db.session, "agency")
+        delete_ids(db.session, model, deletes)
+        if model is Person:
+            apply_deltas(db.session, deltas)
+        if model is Agency:
+            reconcile_agency_counts(db.session, [r["id"] for r in upserts])
+        bump_version(db.session, table_name)
+        db.session.commit()
+    except (SQLAlchemyError, BulkError) as e:
+        db.session.rollback()
+        return (
+            jsonify(
+                {
+                    "message": "Bulk sync failed, no records were changed.",
+                    "error": str(getattr(e, "orig", e)),
+                }
+            ),
+            400,
+        )
+
+    return jsonify(
+        {
+            "message": f"{len(upserts)} records upserted, {len(deletes)} deleted.",
+            "results": results,
+        }
+    )
+
+
+# Admin == True REQUIRED
+@api.route("/person/bulk", methods=["POST"])
+@token_required
+def bulk_sync_people(current_user):
+    if not current_user.admin:
+        return jsonify({"message": "Cannot perform that function."})
+    return bulk_sync(Person, "person", PERSON_FIELDS)
+
+
+# Admin == True REQUIRED
+@api.route("/agency/bulk", methods=["POST"])
+@token_required
+def bulk_sync_agencies(current_user):
+    if not current_user.admin:
+        return jsonify({"message": "Cannot perform that function."})
+    return bulk_sync(Agency, "agency", AGENCY_FIELDS)
+
+
+#############################################################################################
+# Stats Views
+#############################################################################################
+# Person counts grouped by ?group_by=state,year,... and filtered like
+# /person/params. Served from person_rollup unless a filter needs the person
+# table (age, city, location_precision, name).
+@api.route("/stats/person", methods=["GET"])
+@token_required
+@conditional_get("person")
+def get_person_stats(current_user):
+    group_by = list()
+    for value in request.args.getlist("group_by"):
+        group_by.extend(g.strip() for g in value.split(",") if g.strip())
+    unknown = [g for g in group_by if g not in ROLLUP_DIMENSIONS]
+    if unknown:
+        return (
+            jsonify(
+                {
+                    "message": f"Cannot group by {', '.join(unknown)}, "
+                    f"use any of {', '.join(ROLLUP_DIMENSIONS)}"
+                }
+            ),
+            400,
+        )
+
+    try:
+        if has_unsupported_rollup_filters(request.args):
+            source = "person"
+            expressions = dimension_expressions()
+            columns = [expressions[g].label(g) for g in group_by]
+            stats = db.session.query(*columns, func.count().label("count"))
+            stats = stats.filter(*person_filters(request.args))
+        else:
+            source = "rollup"
+            columns = [getattr(PersonRollup, g) for g in group_by]
+            stats = db.session.query(
+                *columns, func.sum(PersonRollup.count).label("count")
+            )
+            stats = stats.filter(PersonRollup.count > 0)
+            stats = stats.filter(*rollup_filters(request.args))
+    except FilterError as e:
+        return jsonify({"message": str(e)}), 400
+
+    if group_by:
+        stats = stats.group_by(*columns).order_by(desc("count"))
+
+    output = list()
+    for row in stats:
+        row_data = {g: dimension_output(g, value) for g, value in zip(group_by, row)}
+        row_data["count"] = int(row[-1] or 0)
+        output.append(row_data)
+    return jsonify({"stats": output, "group_by": group_by, "source": source})
+
+
+#############################################################################################
+# Export Views
+#############################################################################################
+# ?format=csv|parquet|arrow download of people, filtered like /person/params
+# (id= included)
+@api.route("/export/person", methods=["GET"])
+@token_required
+@conditional_get("person")
+def export_people(current_user):
+    try:
+        export_format = get_export_format(request.args)
+        fields = get_fields(request.args, Person)
+        clauses = person_filters(request.args)
+        id_list = get_ids(request.args.getlist("id"))
+    except (ExportError, FieldError, FilterError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    people = db.session.query(*select_columns(Person, fields)).filter(*clauses)
+    if id_list:
+        people = people.filter(Person.id.in_(id_list))
+    return export_response(people.order_by(Person.db_id), Person, fields, export_format)
+
+
+# ?format=csv|parquet|arrow download of agencies, optionally only ?id=...
+@api.route("/export/agency", methods=["GET"])
+@token_required
+@conditional_get("agency")
+def export_agencies(current_user):
+    try:
+        export_format = get_export_format(request.args)
+        fields = get_fields(request.args, Agency)
+    except (ExportError, FieldError) as e:
+        return jsonify({"message": str(e)}), 400
+
+    agencies = db.session.query(*select_columns(Agency, fields))
+    id_list = request.args.getlist("id")
+    if id_list:
+        agencies = agencies.filter(Agency.id.in_(id_list))
+    return export_response(
+        agencies.order_by(Agency.db_id), Agency, fields, export_format
+    )
+
+
+#############################################################################################
+# Metrics Views
+#############################################################################################
+# Prometheus scrape endpoint, aggregated across uWSGI workers
+@api.route("/metrics", methods=["GET"])
+def get_metrics():
+    body, content_type = render_metrics()
+    return make_response(body, 200, {"Content-Type": content_type})
+
+
 #############################################################################################
 # User Views
 #############################################################################################
-@app.route("/user", methods=["GET"])
+@api.route("/user", methods=["GET"])
 @token_required
 def get_all_users(current_user):
     if not current_user.admin:
@@ -456,7 +958,7 @@ def get_all_users(current_user):
     return jsonify({"users": output})
 
 
-@app.route("/user/<public_id>", methods=["GET"])
+@api.route("/user/<public_id>", methods=["GET"])
 @token_required
 def get_one_user(current_user, public_id):
     if not current_user.admin:
@@ -475,7 +977,7 @@ def get_one_user(current_user, public_id):
     return jsonify({"user": user_data})
 
 
-@app.route("/user", methods=["POST"])
+@api.route("/user", methods=["POST"])
 def create_user():
     data = request.get_json()
 
@@ -492,7 +994,7 @@ def create_user():
     return jsonify({"message": "New user created!!"})
 
 
-@app.route("/user/<public_id>", methods=["PUT"])
+@api.route("/user/<public_id>", methods=["PUT"])
 @token_required
 def promote_user(current_user, public_id):
     if not current_user.admin:
@@ -505,11 +1007,13 @@ def promote_user(current_user, public_id):
 
     user.admin = True
     db.session.commit()
+    token_cache.invalidate_user(public_id)
+    api_key_cache.invalidate_user(public_id)
 
     return jsonify({"message": "User has been promoted"})
 
 
-@app.route("/user/<public_id>", methods=["DELETE"])
+@api.route("/user/<public_id>", methods=["DELETE"])
 @token_required
 def delete_user(current_user, public_id):
     if not current_user.admin:
@@ -520,10 +1024,12 @@ def delete_user(current_user, public_id):
         return jsonify({"message": "No user found"})
     db.session.delete(user)
     db.session.commit()
+    token_cache.invalidate_user(public_id)
+    api_key_cache.invalidate_user(public_id)
     return jsonify({"message": "User deleted"})
 
 
-@app.route("/login")
+@api.route("/login")
 def login():
     auth = request.authorization
     if not auth or not auth.username or not auth.password:
@@ -548,10 +1054,117 @@ def login():
                 "public_id": user.public_id,
                 "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=30),
             },
-            app.config["SECRET_KEY"],
+            current_app.config["SECRET_KEY"],
         )
         return jsonify({"token": token})
 
     return make_response(
         "Could not verify", 401, {"WWW-Authenticate": 'Basic realm="Login Required"'}
     )
+
+
+#############################################################################################
+# API Key Views
+#############################################################################################
+# Create a key for the user in public_id (default: the caller). The key is
+# only returned here, the table keeps its hash.
+@api.route("/apikey", methods=["POST"])
+@token_required
+def create_api_key(current_user):
+    if not current_user.admin:
+        return jsonify({"message": "Cannot perform that function."})
+
+    data = request.get_json(silent=True) or dict()
+    public_id = data.get("public_id", current_user.public_id)
+    user = Users.query.filter_by(public_id=public_id).first()
+    if not user:
+        return jsonify({"message": "No user found"})
+
+    key = generate_api_key()
+    new_key = ApiKey(
+        key_hash=hash_api_key(key, current_app.config["SECRET_KEY"]),
+        prefix=key[:API_KEY_PREFIX_LENGTH],
+        name=data.get("name"),
+        user_id=user.id,
+        created_at=datetime.datetime.utcnow().replace(microsecond=0),
+    )
+    db.session.add(new_key)
+    db.session.commit()
+    return jsonify(
+        {"id": new_key.id, "key": key, "prefix": new_key.prefix, "public_id": public_id}
+    )
+
+
+# Every key, revoked ones included. ?public_id= lists one user's keys.
+@api.route("/apikey", methods=["GET"])
+@token_required
+def get_all_api_keys(current_user):
+    if not current_user.admin:
+        return jsonify({"message": "Cannot perform that function."})
+
+    keys = db.session.query(ApiKey, Users.public_id).join(
+        Users, Users.id == ApiKey.user_id
+    )
+    if request.args.get("public_id"):
+        keys = keys.filter(Users.public_id == request.args.get("public_id"))
+    output = list()
+
+    for key, public_id in keys.order_by(ApiKey.id):
+        key_data = dict()
+        key_data["id"] = key.id
+        key_data["prefix"] = key.prefix
+        key_data["name"] = key.name
+        key_data["public_id"] = public_id
+        key_data["created_at"] = key.created_at.isoformat()
+        key_data["revoked_at"] = key.revoked_at and key.revoked_at.isoformat()
+        output.append(key_data)
+    return jsonify({"api_keys": output})
+
+
+@api.route("/apikey/<int:id>", methods=["DELETE"])
+@token_required
+def revoke_api_key(current_user, id):
+    if not current_user.admin:
+        return jsonify({"message": "Cannot perform that function."})
+
+    key = db.session.get(ApiKey, id)
+    if not key:
+        return jsonify({"message": "No API key found"})
+    if key.revoked_at is None:
+        key.revoked_at = datetime.datetime.utcnow().replace(microsecond=0)
+        db.session.commit()
+    api_key_cache.invalidate(key.key_hash)
+    return jsonify({"message": "API key revoked"})
+
+
+#############################################################################################
+# Commands
+#############################################################################################
+@api.cli.command("rebuild-rollups")
+def rebuild_rollups_command():
+    """Recompute person_rollup from the person table."""
+    rebuild_rollup(db.session)
+    # /stats/person answers from person_rollup and is cached on person's version
+    bump_version(db.session, "person")
+    db.session.commit()
+    print("person_rollup rebuilt")
+
+
+@api.cli.command("rebuild-links")
+def rebuild_links_command():
+    """Recompute person_agency from Person.agency_ids."""
+    rebuild_links(db.session)
+    # /agency/<id>/people and ?expand=agencies are cached on person's version
+    bump_version(db.session, "person")
+    db.session.commit()
+    print("person_agency rebuilt")
+
+
+@api.cli.command("reconcile-agency-counts")
+def reconcile_agency_counts_command():
+    """Recount Agency.total_shootings from person_agency."""
+    fixed = reconcile_agency_counts(db.session)
+    if fixed:
+        bump_version(db.session, "agency")
+    db.session.commit()
+    print(f"{fixed} agency counts corrected")
@@ -0,0 +1,7 @@
+from API.app import create_app
+
+# Entry point for uWSGI (config/shooting.ini) and flask --app API.wsgi
+app = create_app()
+
+if __name__ == "__main__":
+    app.run(debug=False)
@@ -0,0 +1,55 @@
+from sqlalchemy import delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Rows per INSERT ... ON CONFLICT / DELETE ... IN statement
+BULK_BATCH_SIZE = 1000
+
+
+def chunks(items: list, size: int = BULK_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+class BulkError(ValueError):
+    pass
+
+
+# Dialects with INSERT ... ON CONFLICT, the only ones the API can run on
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def insert_for(session, model):
+    dialect = session.get_bind(mapper=model.__mapper__).dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise BulkError(f"bulk upsert is not supported on {dialect}")
+    return UPSERT_INSERTS[dialect](model)
+
+
+# Ids from ids that already exist in model's table
+def existing_ids(session, model, ids: list) -> set:
+    found = set()
+    for chunk in chunks(ids):
+        found.update(session.scalars(select(model.id).where(model.id.in_(chunk))))
+    return found
+
+
+# INSERT ... ON CONFLICT (id) DO UPDATE for every record. Each record must
+# carry every column in columns and ids must be unique within records.
+def upsert(session, model, records: list, columns: tuple):
+    for chunk in chunks(records):
+        stmt = insert_for(session, model).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.id],
+            set_={c: stmt.excluded[c] for c in columns if c != "id"},
+        )
+        session.execute(stmt)
+
+
+# DELETE ... WHERE id IN (...) in batches
+def delete_ids(session, model, ids: list):
+    for chunk in chunks(ids):
+        session.execute(
+            delete(model)
+            .where(model.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
@@ -0,0 +1,80 @@
+import math
+from sqlalchemy import or_
+
+# Person.grid_cell numbers a fixed lat/lon grid row by row, so the cells of a
+# bounding box are one contiguous id range per grid row and a plain B-tree
+# index answers viewport queries (Postgres and SQLite alike)
+GRID_CELL_DEGREES = 0.25
+GRID_COLUMNS = int(360 / GRID_CELL_DEGREES)
+GRID_ROWS = int(180 / GRID_CELL_DEGREES)
+
+# Above this many grid rows the range list stops paying off, filter on
+# latitude/longitude alone
+MAX_GRID_ROWS = 64
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# Same computation as grid_cell(), for set-based updates on Postgres
+GRID_CELL_SQL = (
+    f"LEAST(floor((latitude + 90) / {GRID_CELL_DEGREES})::int, {GRID_ROWS - 1})"
+    f" * {GRID_COLUMNS} + "
+    f"LEAST(floor((longitude + 180) / {GRID_CELL_DEGREES})::int, {GRID_COLUMNS - 1})"
+)
+
+
+def _grid_row(latitude: float) -> int:
+    return max(0, min(int((latitude + 90) // GRID_CELL_DEGREES), GRID_ROWS - 1))
+
+
+def _grid_column(longitude: float) -> int:
+    return max(0, min(int((longitude + 180) // GRID_CELL_DEGREES), GRID_COLUMNS - 1))
+
+
+def grid_cell(latitude, longitude):
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(latitude) or math.isnan(longitude):
+        return None
+    return _grid_row(latitude) * GRID_COLUMNS + _grid_column(longitude)
+
+
+# WHERE clause limiting column to the grid cells overlapping the box, or None
+# when the box spans too many grid rows
+def grid_cell_filter(column, south: float, west: float, north: float, east: float):
+    first_row, last_row = _grid_row(south), _grid_row(north)
+    if last_row - first_row + 1 > MAX_GRID_ROWS:
+        return None
+    first_column, last_column = _grid_column(west), _grid_column(east)
+    return or_(
+        *[
+            column.between(
+                row * GRID_COLUMNS + first_column, row * GRID_COLUMNS + last_column
+            )
+            for row in range(first_row, last_row + 1)
+        ]
+    )
+
+
+# (south, west, north, east) of the box containing the circle
+def radius_bounds(latitude: float, longitude: float, radius_km: float) -> tuple:
+    delta_lat = radius_km / KM_PER_DEGREE_LAT
+    cos_lat = max(math.cos(math.radians(latitude)), 0.01)
+    delta_lon = min(radius_km / (KM_PER_DEGREE_LAT * cos_lat), 180)
+    return (
+        max(latitude - delta_lat, -90),
+        max(longitude - delta_lon, -180),
+        min(latitude + delta_lat, 90),
+        min(longitude + delta_lon, 180),
+    )
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,147 @@
+import math
+import re
+from collections import Counter, defaultdict
+from sqlalchemy import and_, delete, func, insert, or_, select, update
+from DB.models import Agency, Person, PersonAgency
+from DB.bulk import chunks
+
+# WaPo separates agency ids with ";", older rows used ","
+AGENCY_ID_SEPARATOR = re.compile(r"[;,]")
+
+# Same split done set-based on Postgres
+LINKS_FROM_PERSON_SQL = (
+    "SELECT DISTINCT p.id, trim(a.agency_id) FROM person AS p, "
+    "regexp_split_to_table(p.agency_ids, '[;,]') AS a(agency_id) "
+    "WHERE trim(a.agency_id) <> ''"
+)
+
+
+# (person_id, *columns) of the agencies linked to person_ids
+def linked_agencies(person_ids: list, columns: list):
+    return (
+        select(PersonAgency.person_id, *columns)
+        .join(Agency, Agency.id == PersonAgency.agency_id)
+        .where(PersonAgency.person_id.in_(person_ids))
+        .order_by(PersonAgency.person_id, Agency.id)
+    )
+
+
+# "12;45" -> ["12", "45"]. Accepts the ints/floats pandas produces too.
+def split_agency_ids(value) -> list:
+    if value is None:
+        return list()
+    if isinstance(value, float):
+        if math.isnan(value):
+            return list()
+        value = int(value)
+    ids = (i.strip() for i in AGENCY_ID_SEPARATOR.split(str(value)))
+    return list(dict.fromkeys(i for i in ids if i))
+
+
+# Make person_agency match {person_id: [agency_id, ...]}, touching only rows
+# that changed. Returns how many people each agency gained (+) or lost (-).
+def set_person_agencies(session, agencies_by_person: dict) -> Counter:
+    current = defaultdict(set)
+    for chunk in chunks(list(agencies_by_person)):
+        rows = session.execute(
+            select(PersonAgency.person_id, PersonAgency.agency_id).where(
+                PersonAgency.person_id.in_(chunk)
+            )
+        )
+        for person_id, agency_id in rows:
+            current[person_id].add(agency_id)
+
+    added = list()
+    removed = list()
+    for person_id, agency_ids in agencies_by_person.items():
+        wanted = set(agency_ids)
+        added.extend((person_id, a) for a in wanted - current[person_id])
+        removed.extend((person_id, a) for a in current[person_id] - wanted)
+
+    for chunk in chunks(removed):
+        session.execute(
+            delete(PersonAgency).where(
+                or_(
+                    *[
+                        and_(
+                            PersonAgency.person_id == person_id,
+                            PersonAgency.agency_id == agency_id,
+                        )
+                        for person_id, agency_id in chunk
+                    ]
+                )
+            )
+        )
+    for chunk in chunks(added):
+        session.execute(
+            insert(PersonAgency),
+            [{"person_id": p, "agency_id": a} for p, a in chunk],
+        )
+
+    deltas = Counter()
+    for _, agency_id in added:
+        deltas[agency_id] += 1
+    for _, agency_id in removed:
+        deltas[agency_id] -= 1
+    return deltas
+
+
+def remove_person_agencies(session, person_ids: list) -> Counter:
+    return set_person_agencies(session, {p: list() for p in person_ids})
+
+
+# Rebuild person_agency from Person.agency_ids
+def rebuild_links(session):
+    session.execute(delete(PersonAgency))
+    links = list()
+    for person_id, agency_ids in session.execute(select(Person.id, Person.agency_ids)):
+        links.extend(
+            {"person_id": person_id, "agency_id": a}
+            for a in split_agency_ids(agency_ids)
+        )
+    for chunk in chunks(links):
+        session.execute(insert(PersonAgency), chunk)
+
+
+# Add per-agency deltas (from set_person_agencies) to Agency.total_shootings.
+# Returns whether any agency row changed.
+def apply_agency_deltas(session, deltas: Counter) -> bool:
+    by_delta = defaultdict(list)
+    for agency_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(agency_id)
+
+    changed = 0
+    for delta, agency_ids in by_delta.items():
+        for chunk in chunks(agency_ids):
+            changed += session.execute(
+                update(Agency)
+                .where(Agency.id.in_(chunk))
+                .values(
+                    total_shootings=func.coalesce(Agency.total_shootings, 0) + delta
+                )
+            ).rowcount
+    return changed > 0
+
+
+# Recount Agency.total_shootings from person_agency, for every agency or
+# only agency_ids. Returns how many agencies were off.
+def reconcile_agency_counts(session, agency_ids: list = None) -> int:
+    count = (
+        select(func.count())
+        .where(PersonAgency.agency_id == Agency.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(Agency)
+        .where(Agency.total_shootings.is_distinct_from(count))
+        .values(total_shootings=count)
+        .execution_options(synchronize_session=False)
+    )
+    if agency_ids is None:
+        return session.execute(stmt).rowcount
+
+    fixed = 0
+    for chunk in chunks(agency_ids):
+        fixed += session.execute(stmt.where(Agency.id.in_(chunk))).rowcount
+    return fixed
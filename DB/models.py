@@ -1,9 +1,21 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, Boolean, Float
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    Float,
+    Date,
+    DateTime,
+    Index,
+    UniqueConstraint,
+    ForeignKey,
+)
 from flask_sqlalchemy import SQLAlchemy
+from DB.routing import RoutingSession
 
 Base = declarative_base()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 # Users for API
@@ -15,13 +27,30 @@ class Users(Base, db.Model):
     password = Column(String(100))
     admin = Column(Boolean)
 
+
+# Long-lived keys for service accounts, sent as x-api-key. Only the
+# HMAC-SHA256 of the key (see API/api_keys.py) is stored.
+class ApiKey(Base, db.Model):
+    __tablename__ = "api_key"
+    id = Column(Integer, primary_key=True)
+    key_hash = Column(String(64), unique=True, nullable=False)
+    # first characters of the key, to tell keys apart in listings
+    prefix = Column(String(8), nullable=False)
+    name = Column(String(50), nullable=True)
+    user_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True
+    )
+    created_at = Column(DateTime, nullable=False)
+    revoked_at = Column(DateTime, nullable=True)
+
+
 # V2
 class Person(Base, db.Model):
     __tablename__ = "person"
     db_id = Column(Integer(), primary_key=True, index=True)
     id = Column(String(10), unique=True)
     name = Column(String(50), nullable=True)
-    date = Column(String(15), nullable=True)
+    date = Column(Date, nullable=True, index=True)
     body_camera = Column(Boolean, nullable=True)
     city = Column(String(50), nullable=True)
     county = Column(String(50), nullable=True)
@@ -38,6 +67,17 @@ class Person(Base, db.Model):
     armed_with = Column(String(50), nullable=True)
     flee_status = Column(String(10), nullable=True)
     agency_ids = Column(String(20), nullable=True)
+    # see DB/geo.py
+    grid_cell = Column(Integer, nullable=True, index=True)
+    # (sort column, db_id) for each of API/pagination.py's PERSON_SORT_KEYS
+    __table_args__ = (
+        Index("ix_person_id_db_id", "id", "db_id"),
+        Index("ix_person_date_db_id", "date", "db_id"),
+        Index("ix_person_name_db_id", "name", "db_id"),
+        Index("ix_person_state_db_id", "state", "db_id"),
+        Index("ix_person_age_db_id", "age", "db_id"),
+    )
+
 
 class Agency(Base, db.Model):
     __tablename__ = "agency"
@@ -48,7 +88,61 @@ class Agency(Base, db.Model):
     state = Column(String(5), nullable=True)
     oricodes = Column(String(50), nullable=True)
     total_shootings = Column(Integer, nullable=True)
+    # (sort column, db_id) for each of API/pagination.py's AGENCY_SORT_KEYS
+    __table_args__ = (
+        Index("ix_agency_id_db_id", "id", "db_id"),
+        Index("ix_agency_name_db_id", "name", "db_id"),
+        Index("ix_agency_state_db_id", "state", "db_id"),
+        Index("ix_agency_total_shootings_db_id", "total_shootings", "db_id"),
+    )
+
+
+# One row per agency listed in Person.agency_ids
+class PersonAgency(Base, db.Model):
+    __tablename__ = "person_agency"
+    person_id = Column(
+        String(10), ForeignKey("person.id", ondelete="CASCADE"), primary_key=True
+    )
+    agency_id = Column(String(10), primary_key=True, index=True)
+
+
+# Bumped on every write to a table, drives ETag/Last-Modified on reads
+class TableVersion(Base, db.Model):
+    __tablename__ = "table_version"
+    table_name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=True)
+
 
+# Person counts per combination of low-cardinality columns, kept up to date by
+# the write views. Unknown values are stored as "" so the unique key works.
+class PersonRollup(Base, db.Model):
+    __tablename__ = "person_rollup"
+    id = Column(Integer, primary_key=True)
+    state = Column(String(50), nullable=False, default="")
+    year = Column(String(4), nullable=False, default="")
+    race = Column(String(15), nullable=False, default="")
+    gender = Column(String(15), nullable=False, default="")
+    threat_type = Column(String(20), nullable=False, default="")
+    armed_with = Column(String(50), nullable=False, default="")
+    flee_status = Column(String(10), nullable=False, default="")
+    body_camera = Column(String(5), nullable=False, default="")
+    was_mental_illness_related = Column(String(5), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        UniqueConstraint(
+            "state",
+            "year",
+            "race",
+            "gender",
+            "threat_type",
+            "armed_with",
+            "flee_status",
+            "body_camera",
+            "was_mental_illness_related",
+            name="uq_person_rollup_dimensions",
+        ),
+    )
 
 
 # Victims of PV V1
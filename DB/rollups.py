@@ -0,0 +1,125 @@
+from collections import Counter
+from sqlalchemy import (
+    Integer,
+    String,
+    case,
+    cast,
+    delete,
+    extract,
+    func,
+    insert,
+    select,
+)
+from DB.models import Person, PersonRollup
+from DB.bulk import chunks, insert_for
+
+# Columns of person_rollup that counts can be grouped/filtered by
+ROLLUP_DIMENSIONS = (
+    "state",
+    "year",
+    "race",
+    "gender",
+    "threat_type",
+    "armed_with",
+    "flee_status",
+    "body_camera",
+    "was_mental_illness_related",
+)
+BOOLEAN_DIMENSIONS = ("body_camera", "was_mental_illness_related")
+
+
+def _get(record, name: str):
+    if isinstance(record, dict):
+        return record.get(name)
+    return getattr(record, name)
+
+
+def _dimension_value(name: str, value) -> str:
+    if value is None:
+        return ""
+    if name == "year":
+        return str(value)[:4]
+    return str(value)
+
+
+# Rollup key of a person, given as a dict or a Person instance
+def rollup_key(record) -> tuple:
+    values = list()
+    for name in ROLLUP_DIMENSIONS:
+        value = _get(record, "date" if name == "year" else name)
+        values.append(_dimension_value(name, value))
+    return tuple(values)
+
+
+# SQL expressions computing each dimension from the person table, matching
+# rollup_key
+def dimension_expressions() -> dict:
+    expressions = dict()
+    for name in ROLLUP_DIMENSIONS:
+        if name == "year":
+            expression = cast(cast(extract("year", Person.date), Integer), String)
+        elif name in BOOLEAN_DIMENSIONS:
+            column = getattr(Person, name)
+            expression = case((column.is_(True), "True"), (column.is_(False), "False"))
+        else:
+            expression = getattr(Person, name)
+        expressions[name] = func.coalesce(expression, "")
+    return expressions
+
+
+# Turn a stored dimension value back into its API value
+def dimension_output(name: str, value):
+    if value == "" or value is None:
+        return None
+    if name == "year":
+        return int(value)
+    if name in BOOLEAN_DIMENSIONS:
+        return value == "True"
+    return value
+
+
+# Add deltas ({rollup_key: +n/-n}) to the rollup in the caller's transaction
+def apply_deltas(session, deltas: Counter):
+    rows = [
+        dict(zip(ROLLUP_DIMENSIONS, key), count=delta)
+        for key, delta in deltas.items()
+        if delta
+    ]
+    for chunk in chunks(rows):
+        stmt = insert_for(session, PersonRollup).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(ROLLUP_DIMENSIONS),
+            set_={"count": PersonRollup.count + stmt.excluded["count"]},
+        )
+        session.execute(stmt)
+
+
+# Person added (delta=1) or removed (delta=-1)
+def count_person(session, record, delta: int = 1):
+    apply_deltas(session, Counter({rollup_key(record): delta}))
+
+
+# Rollup deltas for a bulk write: -1 for the current version of every person
+# in replaced_ids (upserted over or deleted), +1 for every record in upserts
+def bulk_deltas(session, upserts: list, replaced_ids: list) -> Counter:
+    deltas = Counter()
+    columns = [getattr(Person, "date" if d == "year" else d) for d in ROLLUP_DIMENSIONS]
+    for chunk in chunks(replaced_ids):
+        for row in session.execute(select(*columns).where(Person.id.in_(chunk))):
+            deltas[rollup_key(row)] -= 1
+    for record in upserts:
+        deltas[rollup_key(record)] += 1
+    return deltas
+
+
+# Recompute the whole rollup from the person table
+def rebuild_rollup(session):
+    expressions = dimension_expressions()
+    columns = [expressions[name] for name in ROLLUP_DIMENSIONS]
+    session.execute(delete(PersonRollup))
+    session.execute(
+        insert(PersonRollup).from_select(
+            list(ROLLUP_DIMENSIONS) + ["count"],
+            select(*columns, func.count()).group_by(*columns),
+        )
+    )
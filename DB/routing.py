@@ -0,0 +1,67 @@
+import random
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# Requests that can be served from a replica
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# SQLALCHEMY_BINDS keys of the read replicas
+REPLICA_BIND_PREFIX = "replica_"
+
+
+def replica_bind_key(index: int) -> str:
+    return f"{REPLICA_BIND_PREFIX}{index}"
+
+
+# db.session class sending the statements of read-only requests to one of
+# the replica binds. Anything that writes goes to the primary, and so does
+# every later statement of the same session (read-your-writes), as do CLI
+# commands and other work outside a request.
+class RoutingSession(Session):
+    def __init__(self, db, **kwargs):
+        super().__init__(db, **kwargs)
+        self.wrote = False
+        self.replica = None
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or getattr(clause, "is_dml", False):
+                self.wrote = True
+            elif not self.wrote and _is_read_request():
+                replica = self._choose_replica()
+                if replica is not None:
+                    return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    # One replica per session, so a request reads a single snapshot
+    def _choose_replica(self):
+        if self.replica is None:
+            replicas = [
+                engine
+                for key, engine in self._db.engines.items()
+                if key and key.startswith(REPLICA_BIND_PREFIX)
+            ]
+            if replicas:
+                self.replica = random.choice(replicas)
+        return self.replica
+
+    def close(self):
+        super().close()
+        self.wrote = False
+        self.replica = None
+
+
+# For views that only read but can't be a GET, e.g. a lookup whose input is
+# too big for a query string
+def read_only(f):
+    f.read_only = True
+    return f
+
+
+def _is_read_request() -> bool:
+    if not has_request_context():
+        return False
+    if request.method in READ_METHODS:
+        return True
+    view = current_app.view_functions.get(request.endpoint)
+    return getattr(view, "read_only", False)
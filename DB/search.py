@@ -0,0 +1,167 @@
+import bisect
+import re
+import threading
+from collections import defaultdict
+import numpy as np
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from DB.models import Person
+from DB.versioning import get_version
+
+# Minimum trigram similarity for a fuzzy match, pg_trgm's default
+SIMILARITY_THRESHOLD = 0.3
+
+WORD = re.compile(r"[^\W_]+")
+
+
+# Trigrams of text the way pg_trgm builds them: lower-cased words padded with
+# two spaces in front and one behind
+def trigrams(text: str) -> set:
+    grams = set()
+    for word in WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def escape_like(value: str) -> str:
+    return re.sub(r"([\\%_])", r"\\\1", value)
+
+
+# In-process name index for databases without pg_trgm (SQLite, tests).
+# Names are kept in lower-cased sorted order, so the prefix matches of a
+# query are one contiguous slice, and trigram postings are numpy arrays of
+# positions in that order.
+class TrigramIndex:
+    def __init__(self, rows):
+        named = sorted((name.lower(), db_id) for db_id, name in rows if name)
+        self.keys = [key for key, _ in named]
+        self.db_ids = np.array([db_id for _, db_id in named], dtype=np.int64)
+        self.sizes = np.zeros(len(named), dtype=np.int32)
+        postings = defaultdict(list)
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.sizes[position] = len(grams)
+            for gram in grams:
+                postings[gram].append(position)
+        self.postings = {g: np.array(p, dtype=np.int32) for g, p in postings.items()}
+
+    def prefix_range(self, query: str) -> tuple:
+        query = query.lower()
+        start = bisect.bisect_left(self.keys, query)
+        return start, bisect.bisect_left(self.keys, query + chr(0x10FFFF), start)
+
+    # [(db_id, similarity)]: prefix matches first, then fuzzy matches at or
+    # above threshold, best first, ties in name order
+    def search(self, query: str, limit: int, threshold=SIMILARITY_THRESHOLD):
+        size = len(self.keys)
+        query_grams = trigrams(query)
+        lists = [self.postings[g] for g in query_grams if g in self.postings]
+        shared = np.zeros(size, dtype=np.int64)
+        if lists:
+            shared = np.bincount(np.concatenate(lists), minlength=size)
+        union = len(query_grams) + self.sizes - shared
+        similarity = np.divide(
+            shared, union, out=np.zeros(size), where=union > 0, casting="unsafe"
+        )
+
+        prefix = np.zeros(size, dtype=bool)
+        prefix[slice(*self.prefix_range(query))] = True
+        candidates = np.flatnonzero(prefix | (similarity >= threshold))
+        # lexsort sorts by its last key first
+        order = np.lexsort((candidates, -similarity[candidates], ~prefix[candidates]))
+        return [
+            (int(self.db_ids[i]), float(similarity[i]))
+            for i in candidates[order[:limit]]
+        ]
+
+
+_index_lock = threading.Lock()
+# database url -> (person version, TrigramIndex)
+_index_cache = dict()
+# database urls with a rebuild running
+_rebuilding = set()
+
+
+# Version first, so the index is at least as new as the version it's filed
+# under and a write in between only costs another rebuild
+def _load_index(engine) -> tuple:
+    with engine.connect() as conn:
+        version, _ = get_version(conn, "person")
+        index = TrigramIndex(conn.execute(select(Person.db_id, Person.name)))
+    return version, index
+
+
+def _store_index(key: str, version: int, index: TrigramIndex):
+    with _index_lock:
+        cached = _index_cache.get(key)
+        if cached is None or cached[0] < version:
+            _index_cache[key] = (version, index)
+
+
+def _rebuild(engine, key: str):
+    try:
+        _store_index(key, *_load_index(engine))
+    finally:
+        with _index_lock:
+            _rebuilding.discard(key)
+
+
+# Rebuild engine's index on a daemon thread, unless this process has never
+# built one or a rebuild is already running
+def refresh_person_name_index(engine):
+    key = str(engine.url)
+    with _index_lock:
+        if key not in _index_cache or key in _rebuilding:
+            return
+        _rebuilding.add(key)
+    threading.Thread(target=_rebuild, args=(engine, key), daemon=True).start()
+
+
+# TrigramIndex of the person table. Only the first call builds it inline
+# (seconds at 100k names), after a write the previous index keeps answering
+# until the background rebuild replaces it.
+def person_name_index(session) -> TrigramIndex:
+    version, _ = get_version(session, "person")
+    engine = session.get_bind()
+    key = str(engine.url)
+    with _index_lock:
+        cached = _index_cache.get(key)
+    if cached is None:
+        _store_index(key, *_load_index(engine))
+        with _index_lock:
+            return _index_cache[key][1]
+    if cached[0] < version:
+        refresh_person_name_index(engine)
+    return cached[1]
+
+
+# Writes that bump the person version start the rebuild as soon as they
+# commit, so in the writing process the next search usually finds it done
+@event.listens_for(Session, "after_commit")
+def _refresh_after_commit(session):
+    if "person" not in session.info.pop("bumped_tables", ()):
+        return
+    engine = session.get_bind()
+    if engine.dialect.name != "postgresql":
+        refresh_person_name_index(engine)
+
+
+# Postgres: the pg_trgm operators, answered from ix_person_name_trgm.
+# Returns [(db_id, similarity)] ranked like TrigramIndex.search.
+def search_names_pg(session, query: str, limit: int) -> list:
+    similarity = func.similarity(Person.name, query)
+    prefix = Person.name.ilike(escape_like(query) + "%", escape="\\")
+    rows = session.execute(
+        select(Person.db_id, similarity)
+        .where(prefix | Person.name.op("%")(query))
+        .order_by(prefix.desc(), similarity.desc(), Person.name)
+        .limit(limit)
+    )
+    return [(db_id, float(score)) for db_id, score in rows]
+
+
+def search_names(session, query: str, limit: int) -> list:
+    if session.get_bind().dialect.name == "postgresql":
+        return search_names_pg(session, query, limit)
+    return person_name_index(session).search(query, limit)
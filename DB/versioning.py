@@ -0,0 +1,42 @@
+import datetime
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from DB.models import TableVersion
+
+
+# Tables whose version the session's open transaction bumped, for
+# after_commit listeners (see DB/search.py)
+def bumped_tables(session) -> set:
+    return session.info.setdefault("bumped_tables", set())
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_bumped_tables(session):
+    session.info.pop("bumped_tables", None)
+
+
+# Increment table_name's version in the caller's transaction
+def bump_version(session, table_name: str):
+    bumped_tables(session).add(table_name)
+    now = datetime.datetime.utcnow().replace(microsecond=0)
+    result = session.execute(
+        update(TableVersion)
+        .where(TableVersion.table_name == table_name)
+        .values(version=TableVersion.version + 1, updated_at=now)
+    )
+    if result.rowcount == 0:
+        session.add(TableVersion(table_name=table_name, version=1, updated_at=now))
+
+
+def version_query(table_name: str):
+    return select(TableVersion.version, TableVersion.updated_at).where(
+        TableVersion.table_name == table_name
+    )
+
+
+# Returns (version, updated_at) for table_name, (0, None) if never written
+def get_version(session, table_name: str) -> tuple:
+    row = session.execute(version_query(table_name)).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
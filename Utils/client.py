@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+import jwt
+import requests
+from requests.adapters import HTTPAdapter
+
+# Log in again this many seconds before the token's exp
+TOKEN_REFRESH_MARGIN = 60
+
+
+# API client for the sync tool: one keep-alive connection pool, one token
+# shared by every request, and a bounded worker pool for concurrent writes.
+# With api_key set every request sends it and /login is never called.
+class SyncClient:
+    def __init__(
+        self,
+        base_url: str,
+        username: str = None,
+        password: str = None,
+        workers: int = 8,
+        api_key: str = None,
+    ):
+        self.base_url = base_url
+        self.auth = (username, password)
+        self.workers = workers
+        self.api_key = api_key
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {"Accept": "*/*", "Content-Type": "application/json"}
+        )
+        if api_key:
+            self.session.headers["x-api-key"] = api_key
+
+        self._token = None
+        self._token_exp = 0
+        self._lock = threading.Lock()
+
+    def login(self) -> str:
+        response = self.session.get(self.base_url + "login", auth=self.auth)
+        response.raise_for_status()
+        self._token = response.json()["token"]
+        # we only need exp, the API verifies the signature
+        claims = jwt.decode(self._token, options={"verify_signature": False})
+        self._token_exp = claims.get("exp", 0)
+        return self._token
+
+    def token(self) -> str:
+        with self._lock:
+            if (
+                self._token is None
+                or time.time() > self._token_exp - TOKEN_REFRESH_MARGIN
+            ):
+                print("requesting new token")
+                self.login()
+            return self._token
+
+    def _expire(self, token: str):
+        with self._lock:
+            # another thread may already have refreshed it
+            if self._token == token:
+                self._token = None
+
+    # Send a request, logging in again and retrying once on 401
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        url = self.base_url + path.lstrip("/")
+        if self.api_key:
+            return self.session.request(method, url, **kwargs)
+        token = self.token()
+        response = self.session.request(
+            method, url, headers={"x-access-token": token}, **kwargs
+        )
+        if response.status_code == 401:
+            print("token expired... requesting new token before trying again")
+            self._expire(token)
+            response = self.session.request(
+                method, url, headers={"x-access-token": self.token()}, **kwargs
+            )
+        return response
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    # Call fn(item) for every item on the worker pool, keeping at most
+    # max_in_flight calls queued or running. Yields results as they finish.
+    def run(self, fn, items, max_in_flight: int = None):
+        max_in_flight = max_in_flight or self.workers * 2
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            pending = set()
+            for item in items:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+                pending.add(executor.submit(fn, item))
+            for future in as_completed(pending):
+                yield future.result()
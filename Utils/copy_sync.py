@@ -0,0 +1,101 @@
+import csv
+import io
+from dotenv import load_dotenv, dotenv_values
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from DB.models import Person, Agency
+from DB.versioning import bump_version
+from DB.rollups import rebuild_rollup
+from DB.geo import GRID_CELL_SQL
+from DB.links import LINKS_FROM_PERSON_SQL, reconcile_agency_counts
+from Utils.sources import fetch_source
+
+load_dotenv()
+env_vars = dotenv_values("Utils/.env")
+
+MODELS = {"person": Person, "agency": Agency}
+
+# Columns computed from other tables, the CSV's values are not merged
+DERIVED_COLUMNS = {"agency": ("total_shootings",)}
+
+
+# Sync straight into Postgres, bypassing the API
+def get_engine():
+    host = env_vars.get("DB_HOST", "localhost")
+    return create_engine(
+        f"postgresql://{env_vars['DB_USER']}:{env_vars['DB_PASS']}@{host}/{env_vars['DB_NAME']}"
+    )
+
+
+# COPY content (a CSV with a header row) into a temp staging table shaped like
+# data_type's table, then merge it with set-based UPDATE/INSERT/DELETE.
+# Everything runs in one transaction. Returns (updated, inserted, deleted).
+def sync_via_copy(data_type: str, content: bytes = None, engine=None) -> tuple:
+    table = MODELS[data_type].__table__
+    if content is None:
+        content = fetch_source(data_type, force=True).content
+    if engine is None:
+        engine = get_engine()
+
+    header = next(csv.reader(io.StringIO(content.decode("utf-8").split("\n", 1)[0])))
+    columns = [c.name for c in table.columns if c.name != "db_id"]
+    unknown = [c for c in header if c not in columns]
+    if unknown or "id" not in header:
+        raise ValueError(f"Unexpected {data_type} CSV columns: {', '.join(unknown)}")
+
+    staging = f"{table.name}_staging"
+    column_list = ", ".join(header)
+    derived = DERIVED_COLUMNS.get(data_type, ())
+    changed = [c for c in header if c != "id" and c not in derived]
+
+    with Session(engine) as session, session.begin():
+        conn = session.connection()
+        # CREATE TABLE AS keeps the column types but not the NOT NULL/unique
+        # constraints, which COPY doesn't need
+        conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {', '.join(columns)} FROM {table.name} WITH NO DATA"
+        )
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true)",
+            io.BytesIO(content),
+        )
+        conn.exec_driver_sql(f"CREATE INDEX ON {staging} (id)")
+        conn.exec_driver_sql(f"ANALYZE {staging}")
+
+        updated = conn.exec_driver_sql(
+            f"UPDATE {table.name} AS t "
+            f"SET {', '.join(f'{c} = s.{c}' for c in changed)} "
+            f"FROM {staging} AS s WHERE t.id = s.id "
+            f"AND ({', '.join(f't.{c}' for c in changed)}) "
+            f"IS DISTINCT FROM ({', '.join(f's.{c}' for c in changed)})"
+        ).rowcount
+        inserted = conn.exec_driver_sql(
+            f"INSERT INTO {table.name} ({column_list}) "
+            f"SELECT {column_list} FROM {staging} AS s "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {table.name} AS t WHERE t.id = s.id)"
+        ).rowcount
+        deleted = conn.exec_driver_sql(
+            f"DELETE FROM {table.name} AS t "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {staging} AS s WHERE s.id = t.id)"
+        ).rowcount
+
+        if updated or inserted or deleted:
+            if table.name == "person":
+                conn.exec_driver_sql(
+                    f"UPDATE person SET grid_cell = {GRID_CELL_SQL} "
+                    f"WHERE grid_cell IS DISTINCT FROM {GRID_CELL_SQL}"
+                )
+                conn.exec_driver_sql("DELETE FROM person_agency")
+                conn.exec_driver_sql(
+                    "INSERT INTO person_agency (person_id, agency_id) "
+                    + LINKS_FROM_PERSON_SQL
+                )
+                rebuild_rollup(session)
+            bump_version(session, table.name)
+            if reconcile_agency_counts(session) and table.name != "agency":
+                bump_version(session, "agency")
+
+    print(f"{data_type}: {inserted} new, {updated} changed, {deleted} removed")
+    return updated, inserted, deleted
@@ -0,0 +1,69 @@
+import hashlib
+import json
+import math
+
+
+class Changeset:
+    def __init__(self):
+        self.inserts = list()  # new records
+        self.updates = list()  # new records whose content changed
+        self.deletes = list()  # ids only present in the old data
+
+    def __len__(self):
+        return len(self.inserts) + len(self.updates) + len(self.deletes)
+
+
+# CSV ids come back from pandas as ints, API ids are strings
+def normalize_id(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+# Make CSV and API values comparable: NaN -> None, 23.0 -> 23
+def normalize_value(value):
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if math.isnan(value):
+            return None
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+# Values are compared as strings (like the old field-by-field check did) so
+# 123 and "123" hash the same
+def content_hash(record: dict, fields: tuple) -> bytes:
+    values = list()
+    for field in fields:
+        value = normalize_value(record.get(field))
+        values.append(None if value is None else str(value))
+    payload = json.dumps(values, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode(), digest_size=16).digest()
+
+
+# Hash-join new_records against old_records on id in O(n + m).
+# fields defaults to the keys of the new records minus ignore.
+def diff_records(
+    new_records: list, old_records: list, fields: tuple = None, ignore=("db_id",)
+) -> Changeset:
+    changes = Changeset()
+    if fields is None:
+        keys = new_records[0] if new_records else dict()
+        fields = tuple(k for k in keys if k != "id" and k not in ignore)
+
+    old_by_id = {normalize_id(record["id"]): record for record in old_records}
+    seen = set()
+
+    for record in new_records:
+        record_id = normalize_id(record["id"])
+        seen.add(record_id)
+        old_record = old_by_id.get(record_id)
+        if old_record is None:
+            changes.inserts.append(record)
+        elif content_hash(record, fields) != content_hash(old_record, fields):
+            changes.updates.append(record)
+
+    changes.deletes = [record_id for record_id in old_by_id if record_id not in seen]
+    return changes
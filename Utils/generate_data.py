@@ -0,0 +1,573 @@
+import datetime
+import io
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, delete, insert
+from sqlalchemy.orm import Session
+from DB.models import Person, Agency, PersonAgency, PersonRollup
+from DB.geo import GRID_CELL_DEGREES, GRID_COLUMNS, GRID_ROWS
+from DB.links import LINKS_FROM_PERSON_SQL, rebuild_links, reconcile_agency_counts
+from DB.rollups import rebuild_rollup
+from DB.versioning import bump_version
+
+# Size of the real WaPo dataset, what --scale multiplies
+BASE_PERSONS = 10_000
+BASE_AGENCIES = 3_000
+MAX_SCALE = 1000
+
+# Rows generated and loaded per round
+GENERATE_BATCH_SIZE = 100_000
+
+# Generated ids start here so they never collide with the real ones
+DEFAULT_START_ID = 10_000_000
+
+# Value distributions of the v2 CSV columns, used without --person-sample /
+# --agency-sample. None is a missing value.
+PERSON_DISTRIBUTIONS = {
+    "body_camera": {False: 0.85, True: 0.15},
+    "gender": {"male": 0.955, "female": 0.043, "non-binary": 0.001, None: 0.001},
+    "race": {
+        "W": 0.41,
+        "B": 0.22,
+        "H": 0.15,
+        "A": 0.017,
+        "N": 0.014,
+        "O": 0.002,
+        None: 0.187,
+    },
+    "race_source": {
+        "public_record": 0.55,
+        "notes": 0.15,
+        "photo": 0.08,
+        "not_available": 0.2,
+        None: 0.02,
+    },
+    "was_mental_illness_related": {False: 0.79, True: 0.21},
+    "threat_type": {
+        "shoot": 0.3,
+        "point": 0.27,
+        "attack": 0.18,
+        "threat": 0.1,
+        "move": 0.06,
+        "flee": 0.04,
+        "accident": 0.01,
+        None: 0.04,
+    },
+    "armed_with": {
+        "gun": 0.57,
+        "knife": 0.14,
+        "unarmed": 0.06,
+        "vehicle": 0.05,
+        "replica": 0.03,
+        "blunt_object": 0.02,
+        "undetermined": 0.04,
+        "other": 0.04,
+        None: 0.05,
+    },
+    "flee_status": {"not": 0.6, "car": 0.16, "foot": 0.13, "other": 0.03, None: 0.08},
+    "location_precision": {
+        "not_available": 0.45,
+        "address": 0.35,
+        "intersection": 0.1,
+        "block": 0.05,
+        "city": 0.03,
+        None: 0.02,
+    },
+}
+AGENCY_DISTRIBUTIONS = {
+    "type": {
+        "local_police": 0.72,
+        "sheriff": 0.2,
+        "state_police": 0.04,
+        "federal": 0.02,
+        "other": 0.02,
+    },
+}
+# Share of each state in the real data, and where its people are
+# fmt: off
+STATE_WEIGHTS = {
+    "CA": 0.14, "TX": 0.1, "FL": 0.07, "AZ": 0.05, "GA": 0.04, "CO": 0.035,
+    "WA": 0.03, "OK": 0.03, "NC": 0.03, "OH": 0.03, "TN": 0.028, "MO": 0.025,
+    "NM": 0.02, "LA": 0.02, "IL": 0.02, "NV": 0.02, "AL": 0.02, "PA": 0.02,
+    "NY": 0.02, "IN": 0.02, "KY": 0.018, "VA": 0.018, "OR": 0.017, "SC": 0.017,
+    "AR": 0.015, "MI": 0.015, "MS": 0.013, "WI": 0.013, "MD": 0.012, "NJ": 0.011,
+    "KS": 0.01, "UT": 0.01, "MN": 0.01, "WV": 0.009, "ID": 0.007, "NE": 0.005,
+    "MT": 0.005, "IA": 0.005, "AK": 0.005, "HI": 0.004, "ME": 0.003, "MA": 0.003,
+    "WY": 0.003, "NH": 0.002, "SD": 0.002, "CT": 0.002, "DE": 0.002, "ND": 0.001,
+    "DC": 0.001, "VT": 0.001, "RI": 0.001,
+}
+STATE_CENTROIDS = {
+    "AL": (32.8, -86.8), "AK": (61.4, -150.0), "AZ": (33.7, -111.9),
+    "AR": (34.9, -92.4), "CA": (36.1, -119.7), "CO": (39.1, -105.3),
+    "CT": (41.6, -72.7), "DE": (39.3, -75.5), "DC": (38.9, -77.0),
+    "FL": (27.8, -81.7), "GA": (33.0, -83.6), "HI": (21.1, -157.5),
+    "ID": (44.2, -114.5), "IL": (40.3, -89.0), "IN": (39.8, -86.3),
+    "IA": (42.0, -93.2), "KS": (38.5, -96.7), "KY": (37.7, -84.7),
+    "LA": (31.2, -91.9), "ME": (44.7, -69.4), "MD": (39.1, -76.8),
+    "MA": (42.2, -71.5), "MI": (43.3, -84.5), "MN": (45.7, -93.9),
+    "MS": (32.7, -89.7), "MO": (38.5, -92.3), "MT": (46.9, -110.5),
+    "NE": (41.1, -98.3), "NV": (38.3, -117.1), "NH": (43.5, -71.6),
+    "NJ": (40.3, -74.5), "NM": (34.8, -106.2), "NY": (42.2, -74.9),
+    "NC": (35.6, -79.8), "ND": (47.5, -99.8), "OH": (40.4, -82.8),
+    "OK": (35.6, -96.9), "OR": (44.6, -122.1), "PA": (40.6, -77.2),
+    "RI": (41.7, -71.5), "SC": (33.9, -80.9), "SD": (44.3, -99.4),
+    "TN": (35.7, -86.7), "TX": (31.1, -97.6), "UT": (40.2, -111.9),
+    "VT": (44.0, -72.7), "VA": (37.8, -78.2), "WA": (47.4, -121.5),
+    "WV": (38.5, -81.0), "WI": (44.3, -89.6), "WY": (42.8, -107.3),
+}
+# Common first and last names, roughly by frequency among the (mostly male)
+# people in the real data
+FIRST_NAMES = {
+    "Michael": 0.04, "James": 0.035, "Robert": 0.03, "John": 0.03,
+    "David": 0.028, "Christopher": 0.027, "William": 0.025, "Joseph": 0.024,
+    "Daniel": 0.022, "Anthony": 0.021, "Richard": 0.018, "Jose": 0.017,
+    "Charles": 0.016, "Thomas": 0.016, "Joshua": 0.015, "Brandon": 0.014,
+    "Matthew": 0.014, "Kevin": 0.013, "Jason": 0.013, "Justin": 0.012,
+    "Eric": 0.012, "Andrew": 0.011, "Steven": 0.011, "Juan": 0.011,
+    "Timothy": 0.01, "Jeffrey": 0.01, "Mark": 0.01, "Carlos": 0.009,
+    "Jonathan": 0.009, "Ryan": 0.009, "Luis": 0.008, "Tyler": 0.008,
+    "Aaron": 0.008, "Adam": 0.007, "Marcus": 0.007, "Miguel": 0.007,
+    "Jesse": 0.006, "Terrance": 0.005, "Andre": 0.005, "Jennifer": 0.004,
+    "Maria": 0.004, "Jessica": 0.003, "Ashley": 0.003, "Sarah": 0.002,
+}
+LAST_NAMES = {
+    "Smith": 0.02, "Johnson": 0.017, "Williams": 0.015, "Brown": 0.013,
+    "Jones": 0.013, "Garcia": 0.012, "Miller": 0.011, "Davis": 0.011,
+    "Rodriguez": 0.01, "Martinez": 0.01, "Hernandez": 0.01, "Lopez": 0.008,
+    "Gonzalez": 0.008, "Wilson": 0.008, "Anderson": 0.007, "Thomas": 0.007,
+    "Taylor": 0.007, "Moore": 0.006, "Jackson": 0.006, "Martin": 0.006,
+    "Lee": 0.006, "Perez": 0.005, "Thompson": 0.005, "White": 0.005,
+    "Harris": 0.005, "Sanchez": 0.005, "Clark": 0.004, "Ramirez": 0.004,
+    "Lewis": 0.004, "Robinson": 0.004, "Walker": 0.004, "Young": 0.004,
+    "Allen": 0.003, "King": 0.003, "Wright": 0.003, "Scott": 0.003,
+    "Torres": 0.003, "Nguyen": 0.003, "Hill": 0.003, "Flores": 0.003,
+    "Green": 0.003, "Adams": 0.003, "Nelson": 0.003, "Baker": 0.003,
+    "Hall": 0.003, "Rivera": 0.003, "Campbell": 0.002, "Mitchell": 0.002,
+    "Carter": 0.002, "Roberts": 0.002,
+}
+# Place and county names that recur across states. Each state draws its
+# cities and their counties from these.
+CITY_NAMES = (
+    "Springfield", "Franklin", "Greenville", "Bristol", "Clinton", "Fairview",
+    "Salem", "Madison", "Georgetown", "Arlington", "Ashland", "Dover",
+    "Oxford", "Jackson", "Burlington", "Manchester", "Milton", "Newport",
+    "Auburn", "Dayton", "Lexington", "Milford", "Riverside", "Cleveland",
+    "Hudson", "Kingston", "Mount Vernon", "Oakland", "Winchester", "Centerville",
+    "Marion", "Lebanon", "Columbia", "Florence", "Chester", "Troy",
+    "Harrison", "Monroe", "Lakewood", "Waverly", "Glendale", "Princeton",
+    "Hamilton", "Richmond", "Plymouth", "Portland", "Union", "Warren",
+)
+COUNTY_NAMES = (
+    "Washington", "Jefferson", "Franklin", "Jackson", "Lincoln", "Madison",
+    "Montgomery", "Clay", "Marion", "Monroe", "Union", "Wayne", "Greene",
+    "Warren", "Carroll", "Polk", "Lee", "Grant", "Clark", "Adams", "Johnson",
+    "Hamilton", "Lake", "Douglas", "Marshall", "Shelby", "Morgan", "Orange",
+)
+# fmt: on
+# Share of people with no name, and of names with a middle initial
+MISSING_NAME = 0.03
+MIDDLE_INITIAL = 0.3
+# Share of places with no county
+MISSING_COUNTY = 0.1
+# Standard deviation (degrees) of city centers around the state centroid,
+# and of people around their city
+STATE_SPREAD = 1.5
+CITY_SPREAD = 0.1
+CITIES_PER_STATE = 40
+# Larger exponents put more of a state's people in its biggest cities
+CITY_SIZE_EXPONENT = 1.0
+# Share of people with no coordinates / listed under two agencies
+MISSING_LOCATION = 0.05
+SECOND_AGENCY = 0.08
+# Larger exponents concentrate people in fewer agencies
+AGENCY_SIZE_EXPONENT = 0.9
+AGE_MEAN = 37
+AGE_SD = 13
+FIRST_DAY = datetime.date(2015, 1, 1)
+
+
+# {column: (values, probabilities)} from a sample CSV, falling back to
+# defaults for columns the sample doesn't have
+def distributions(sample: pd.DataFrame, defaults: dict) -> dict:
+    output = dict()
+    for column, frequencies in defaults.items():
+        if sample is not None and column in sample:
+            counts = sample[column].value_counts(normalize=True, dropna=False)
+            frequencies = {
+                (None if pd.isna(value) else value): share
+                for value, share in counts.items()
+            }
+        values = list(frequencies)
+        weights = np.array(list(frequencies.values()), dtype=float)
+        output[column] = (values, weights / weights.sum())
+    return output
+
+
+def state_weights(sample: pd.DataFrame) -> tuple:
+    if sample is not None and "state" in sample:
+        counts = sample["state"].value_counts(normalize=True)
+        counts = counts[counts.index.isin(list(STATE_CENTROIDS))]
+        return list(counts.index), counts.to_numpy() / counts.sum()
+    weights = np.array(list(STATE_WEIGHTS.values()))
+    return list(STATE_WEIGHTS), weights / weights.sum()
+
+
+# Per-state centroid and spread, measured from the sample when it has
+# coordinates for the state
+def state_locations(sample: pd.DataFrame) -> dict:
+    locations = {
+        s: (lat, lon, STATE_SPREAD) for s, (lat, lon) in STATE_CENTROIDS.items()
+    }
+    if sample is None or not {"state", "latitude", "longitude"} <= set(sample):
+        return locations
+    located = sample.dropna(subset=["latitude", "longitude"])
+    for state, group in located.groupby("state"):
+        if state in locations and len(group) >= 5:
+            spread = float(np.nanmean([group.latitude.std(), group.longitude.std()]))
+            locations[state] = (group.latitude.mean(), group.longitude.mean(), spread)
+    return locations
+
+
+def _normalized(frequencies: dict) -> tuple:
+    weights = np.array(list(frequencies.values()), dtype=float)
+    return list(frequencies), weights / weights.sum()
+
+
+# (first names, last names, share of missing names) from the sample's name
+# column, split on the first and last word
+def name_distributions(sample: pd.DataFrame) -> tuple:
+    if sample is None or "name" not in sample:
+        return _normalized(FIRST_NAMES), _normalized(LAST_NAMES), MISSING_NAME
+    names = sample["name"].dropna().astype(str).str.split()
+    names = names[names.str.len() >= 2]
+    if names.empty:
+        return _normalized(FIRST_NAMES), _normalized(LAST_NAMES), MISSING_NAME
+    first = names.str[0].value_counts(normalize=True)
+    last = names.str[-1].value_counts(normalize=True)
+    return (
+        (list(first.index), first.to_numpy()),
+        (list(last.index), last.to_numpy()),
+        float(sample["name"].isna().mean()),
+    )
+
+
+# {state: (names, weights, latitudes, longitudes, counties)} of the cities
+# people are spread over. Built-in names with Zipf-like sizes around the
+# state's location, replaced by the sample's own cities, their share, mean
+# location and most common county where the sample has them.
+def state_cities(rng, sample: pd.DataFrame, locations: dict) -> dict:
+    weights = 1 / np.arange(1, CITIES_PER_STATE + 1) ** CITY_SIZE_EXPONENT
+    cities = dict()
+    for state, (lat, lon, spread) in locations.items():
+        counties = rng.choice(np.array(COUNTY_NAMES, dtype=object), CITIES_PER_STATE)
+        counties[rng.random(CITIES_PER_STATE) < MISSING_COUNTY] = None
+        cities[state] = (
+            rng.choice(np.array(CITY_NAMES, dtype=object), CITIES_PER_STATE, False),
+            weights / weights.sum(),
+            rng.normal(lat, spread, CITIES_PER_STATE),
+            rng.normal(lon, spread, CITIES_PER_STATE),
+            counties,
+        )
+    if sample is None or not {"state", "city"} <= set(sample):
+        return cities
+
+    for state, group in sample.dropna(subset=["city"]).groupby("state"):
+        if state not in cities:
+            continue
+        counts = group["city"].value_counts().head(CITIES_PER_STATE)
+        lat, lon, spread = locations[state]
+        latitude = rng.normal(lat, spread, len(counts))
+        longitude = rng.normal(lon, spread, len(counts))
+        counties = np.full(len(counts), None, dtype=object)
+        for i, city in enumerate(counts.index):
+            rows = group[group["city"] == city]
+            if {"latitude", "longitude"} <= set(rows) and rows.latitude.notna().any():
+                latitude[i] = rows.latitude.mean()
+                longitude[i] = rows.longitude.mean()
+            if "county" in rows and rows.county.notna().any():
+                counties[i] = rows.county.mode().iloc[0]
+        cities[state] = (
+            counts.index.to_numpy(dtype=object),
+            counts.to_numpy() / counts.sum(),
+            latitude,
+            longitude,
+            counties,
+        )
+    return cities
+
+
+def choose(rng, distribution: tuple, size: int) -> np.ndarray:
+    values, weights = distribution
+    picks = rng.choice(len(values), size=size, p=weights)
+    return np.array(values, dtype=object)[picks]
+
+
+# Vectorized DB.geo.grid_cell
+def grid_cells(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    rows = np.clip(np.floor((latitude + 90) / GRID_CELL_DEGREES), 0, GRID_ROWS - 1)
+    columns = np.clip(
+        np.floor((longitude + 180) / GRID_CELL_DEGREES), 0, GRID_COLUMNS - 1
+    )
+    cells = pd.array(rows * GRID_COLUMNS + columns, dtype="Int64")
+    cells[np.isnan(latitude)] = pd.NA
+    return cells
+
+
+class Generator:
+    def __init__(self, person_sample=None, agency_sample=None, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.person_distributions = distributions(person_sample, PERSON_DISTRIBUTIONS)
+        self.agency_distributions = distributions(agency_sample, AGENCY_DISTRIBUTIONS)
+        self.states = state_weights(person_sample)
+        self.ages = None
+        self.dates = None
+        if person_sample is not None and "age" in person_sample:
+            self.ages = person_sample["age"].dropna().to_numpy()
+        if person_sample is not None and "date" in person_sample:
+            dates = pd.to_datetime(person_sample["date"], errors="coerce").dropna()
+            self.dates = dates.dt.date.to_numpy()
+
+        self.first_names, self.last_names, self.missing_names = name_distributions(
+            person_sample
+        )
+        # a fixed set of cities per state, people cluster around them
+        self.cities = state_cities(
+            self.rng, person_sample, state_locations(person_sample)
+        )
+        self.agencies_by_state = dict()
+
+    # Agencies spread over states like people, each state's agencies with
+    # Zipf-like weights so a few large departments dominate
+    def agencies(self, count: int, start_id: int) -> pd.DataFrame:
+        states = choose(self.rng, self.states, count)
+        ids = np.arange(start_id, start_id + count)
+        frame = pd.DataFrame(
+            {
+                "id": ids.astype(str),
+                "name": [f"Agency {i}" for i in ids],
+                "type": choose(self.rng, self.agency_distributions["type"], count),
+                "state": states,
+                "oricodes": [f"{s}{i % 10**7:07d}" for s, i in zip(states, ids)],
+                "total_shootings": 0,
+            }
+        )
+        for state, group in frame.groupby("state"):
+            weights = 1 / np.arange(1, len(group) + 1) ** AGENCY_SIZE_EXPONENT
+            self.agencies_by_state[state] = (
+                group["id"].to_numpy(),
+                weights / weights.sum(),
+            )
+        return frame
+
+    def _agency_ids(self, states: np.ndarray) -> np.ndarray:
+        agency_ids = np.full(len(states), None, dtype=object)
+        second = self.rng.random(len(states)) < SECOND_AGENCY
+        for state in np.unique(states):
+            if state not in self.agencies_by_state:
+                continue
+            ids, weights = self.agencies_by_state[state]
+            mask = states == state
+            first = self.rng.choice(ids, size=mask.sum(), p=weights)
+            other = self.rng.choice(ids, size=mask.sum(), p=weights)
+            agency_ids[mask] = [
+                f"{a};{b}" if two and a != b else a
+                for a, b, two in zip(first, other, second[mask])
+            ]
+        return agency_ids
+
+    def _locations(self, states: np.ndarray) -> tuple:
+        latitude = np.full(len(states), np.nan)
+        longitude = np.full(len(states), np.nan)
+        city = np.full(len(states), None, dtype=object)
+        county = np.full(len(states), None, dtype=object)
+        for state in np.unique(states):
+            mask = states == state
+            names, weights, city_lat, city_lon, counties = self.cities[state]
+            picks = self.rng.choice(len(names), size=mask.sum(), p=weights)
+            latitude[mask] = self.rng.normal(city_lat[picks], CITY_SPREAD)
+            longitude[mask] = self.rng.normal(city_lon[picks], CITY_SPREAD)
+            city[mask] = names[picks]
+            county[mask] = counties[picks]
+        missing = self.rng.random(len(states)) < MISSING_LOCATION
+        latitude[missing] = np.nan
+        longitude[missing] = np.nan
+        latitude = np.clip(latitude, -90, 90)
+        return latitude, np.clip(longitude, -180, 180), city, county
+
+    def _names(self, count: int) -> np.ndarray:
+        first = choose(self.rng, self.first_names, count)
+        last = choose(self.rng, self.last_names, count)
+        initials = self.rng.integers(ord("A"), ord("Z") + 1, count)
+        middle = self.rng.random(count) < MIDDLE_INITIAL
+        names = np.array(
+            [
+                f"{a} {chr(i)}. {b}" if m else f"{a} {b}"
+                for a, b, i, m in zip(first, last, initials, middle)
+            ],
+            dtype=object,
+        )
+        names[self.rng.random(count) < self.missing_names] = None
+        return names
+
+    def people(self, count: int, start_id: int) -> pd.DataFrame:
+        rng = self.rng
+        states = choose(rng, self.states, count)
+        latitude, longitude, city, county = self._locations(states)
+        if self.ages is not None and len(self.ages):
+            ages = rng.choice(self.ages, count)
+        else:
+            ages = np.clip(rng.normal(AGE_MEAN, AGE_SD, count), 12, 90).round()
+        if self.dates is not None and len(self.dates):
+            dates = rng.choice(self.dates, count)
+        else:
+            days = (datetime.date.today() - FIRST_DAY).days
+            dates = np.datetime64(FIRST_DAY) + rng.integers(0, days, count)
+        ids = np.arange(start_id, start_id + count)
+
+        frame = pd.DataFrame(
+            {
+                "id": ids.astype(str),
+                "name": self._names(count),
+                "date": pd.to_datetime(dates).date,
+                "city": city,
+                "county": county,
+                "state": states,
+                "longitude": longitude,
+                "latitude": latitude,
+                "age": pd.array(ages, dtype="Int64"),
+                "agency_ids": self._agency_ids(states),
+                "grid_cell": grid_cells(latitude, longitude),
+            }
+        )
+        for column, distribution in self.person_distributions.items():
+            frame[column] = choose(rng, distribution, count)
+        return frame
+
+
+# Postgres: COPY the frame in as CSV
+def copy_frame(session, table, frame: pd.DataFrame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+
+
+# Anything else: executemany
+def insert_frame(session, table, frame: pd.DataFrame):
+    frame = frame.astype(object).where(frame.notna(), None)
+    session.execute(insert(table), frame.to_dict("records"))
+
+
+def load(session, table, frame: pd.DataFrame):
+    if session.get_bind().dialect.name == "postgresql":
+        copy_frame(session, table, frame)
+    else:
+        insert_frame(session, table, frame)
+
+
+# Rebuild person_agency, Agency.total_shootings and person_rollup from the
+# loaded rows and bump both table versions
+def rebuild_derived(session):
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(delete(PersonAgency))
+        session.connection().exec_driver_sql(
+            "INSERT INTO person_agency (person_id, agency_id) " + LINKS_FROM_PERSON_SQL
+        )
+    else:
+        rebuild_links(session)
+    reconcile_agency_counts(session)
+    rebuild_rollup(session)
+    bump_version(session, "person")
+    bump_version(session, "agency")
+
+
+def generate(
+    engine,
+    scale: int,
+    person_sample=None,
+    agency_sample=None,
+    seed: int = 0,
+    start_id: int = DEFAULT_START_ID,
+    replace: bool = False,
+) -> tuple:
+    generator = Generator(person_sample, agency_sample, seed)
+    base_persons = BASE_PERSONS if person_sample is None else len(person_sample)
+    base_agencies = BASE_AGENCIES if agency_sample is None else len(agency_sample)
+    persons = base_persons * scale
+    agencies = base_agencies * scale
+
+    with Session(engine) as session, session.begin():
+        if replace:
+            for model in (PersonAgency, PersonRollup, Person, Agency):
+                session.execute(delete(model))
+        load(session, Agency.__table__, generator.agencies(agencies, start_id))
+        for offset in range(0, persons, GENERATE_BATCH_SIZE):
+            count = min(GENERATE_BATCH_SIZE, persons - offset)
+            frame = generator.people(count, start_id + offset)
+            load(session, Person.__table__, frame)
+            print(f"person: {offset + count}/{persons}")
+        rebuild_derived(session)
+    return persons, agencies
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(
+        description="Load a synthetic person/agency dataset for scale testing"
+    )
+    parser.add_argument(
+        "--scale",
+        type=int,
+        default=10,
+        help=f"multiple of the real dataset's size, 1-{MAX_SCALE}",
+    )
+    parser.add_argument(
+        "--database",
+        help="SQLAlchemy URI, defaults to the Postgres database in Utils/.env",
+    )
+    parser.add_argument(
+        "--person-sample", help="WaPo person CSV to copy value distributions from"
+    )
+    parser.add_argument(
+        "--agency-sample", help="WaPo agency CSV to copy value distributions from"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-id", type=int, default=DEFAULT_START_ID)
+    parser.add_argument(
+        "--replace",
+        action="store_true",
+        help="delete every person and agency before loading",
+    )
+    args = parser.parse_args()
+    if not 1 <= args.scale <= MAX_SCALE:
+        parser.error(f"--scale must be between 1 and {MAX_SCALE}")
+
+    if args.database:
+        engine = create_engine(args.database)
+    else:
+        from Utils.copy_sync import get_engine
+
+        engine = get_engine()
+    person_sample = pd.read_csv(args.person_sample) if args.person_sample else None
+    agency_sample = pd.read_csv(args.agency_sample) if args.agency_sample else None
+
+    started = time.perf_counter()
+    persons, agencies = generate(
+        engine,
+        args.scale,
+        person_sample,
+        agency_sample,
+        seed=args.seed,
+        start_id=args.start_id,
+        replace=args.replace,
+    )
+    print(
+        f"loaded {persons} people and {agencies} agencies "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
@@ -0,0 +1,100 @@
+import email.utils
+import hashlib
+import json
+import os
+import requests
+
+# Washington Post data-police-shootings v2 CSVs
+CSV_URLS = {
+    "person": r"https://raw.githubusercontent.com/washingtonpost/data-police-shootings/master/v2/fatal-police-shootings-data.csv",
+    "agency": r"https://raw.githubusercontent.com/washingtonpost/data-police-shootings/master/v2/fatal-police-shootings-agencies.csv",
+}
+
+# ETag / Last-Modified / sha256 of the last CSV synced, per source
+STATE_PATH = "Utils/.sync_state.json"
+
+
+# PERSON_CSV_URL / AGENCY_CSV_URL override the upstream URL, e.g. with a local
+# file path or a `python -m http.server` URL to run the sync offline
+def source_url(data_type: str) -> str:
+    return os.environ.get(f"{data_type.upper()}_CSV_URL", CSV_URLS[data_type])
+
+
+def load_state(state_path: str = STATE_PATH) -> dict:
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return dict()
+
+
+class Fetch:
+    def __init__(self, data_type: str, state: dict, state_path: str):
+        self.data_type = data_type
+        self.state = state
+        self.state_path = state_path
+        self.content = None
+        self.changed = False
+
+    # Record this fetch as synced. Call only once the changes were applied,
+    # so a failed sync is retried next run.
+    def save(self):
+        state = load_state(self.state_path)
+        state[self.data_type] = self.state
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+
+def _fetch_file(path: str, previous: dict) -> tuple:
+    mtime = os.path.getmtime(path)
+    last_modified = email.utils.formatdate(mtime, usegmt=True)
+    if previous.get("last_modified") == last_modified:
+        return None, {"last_modified": last_modified}
+    with open(path, "rb") as f:
+        return f.read(), {"last_modified": last_modified}
+
+
+def _fetch_http(url: str, previous: dict, session=None) -> tuple:
+    headers = dict()
+    if previous.get("etag"):
+        headers["If-None-Match"] = previous["etag"]
+    if previous.get("last_modified"):
+        headers["If-Modified-Since"] = previous["last_modified"]
+
+    response = (session or requests).get(url, headers=headers, timeout=60)
+    if response.status_code == 304:
+        return None, dict()
+    response.raise_for_status()
+    validators = {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+    return response.content, validators
+
+
+# Fetch data_type's CSV unless it is unchanged since the last saved sync.
+# fetch.changed is False when the server answered 304, the file's mtime
+# matches, or the body hashes to the digest we synced last time.
+def fetch_source(
+    data_type: str, state_path: str = STATE_PATH, force: bool = False, session=None
+) -> Fetch:
+    previous = dict() if force else load_state(state_path).get(data_type, dict())
+    url = source_url(data_type)
+
+    if url.startswith(("http://", "https://")):
+        content, validators = _fetch_http(url, previous, session)
+    else:
+        path = url[len("file://") :] if url.startswith("file://") else url
+        content, validators = _fetch_file(path, previous)
+
+    fetch = Fetch(data_type, {**previous, **validators}, state_path)
+    if content is None:
+        return fetch
+
+    digest = hashlib.sha256(content).hexdigest()
+    fetch.state["sha256"] = digest
+    fetch.content = content
+    fetch.changed = digest != previous.get("sha256")
+    return fetch
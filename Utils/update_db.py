@@ -1,205 +1,167 @@
+import io
 import json
-import requests
 from dotenv import load_dotenv, dotenv_values
 import pandas as pd
+from Utils.diff import Changeset, diff_records
+from Utils.sources import fetch_source
+from Utils.client import SyncClient
 
 load_dotenv()
 env_vars = dotenv_values("Utils/.env")
-username = env_vars["username"]
-password = env_vars["password"]
+# api_key (see POST /apikey) replaces username/password when set
+username = env_vars.get("username")
+password = env_vars.get("password")
+api_key = env_vars.get("api_key")
 
 base_url = "http://localhost:5000/"
 
+# Shared session, token and worker pool for every API call
+client = SyncClient(
+    base_url,
+    username,
+    password,
+    workers=int(env_vars.get("sync_workers", 8)),
+    api_key=api_key,
+)
+
+# Fields the API derives itself, differences there are not upstream changes
+DIFF_IGNORE = {"agency": ("db_id", "total_shootings")}
+
 
 # AUTH with backend to perform needed operations on DB
-def get_token() -> dict:
-    response = requests.get(base_url + "login", auth=(username, password))
-    print(response)
-    return json.loads(response.content)["token"]
+def get_token() -> str:
+    return client.token()
 
 
 # Fetch ALL records from DB for given table
 def get_old_data(tablename: str) -> dict:
-    headers = get_headers()
-    response = requests.get(base_url + tablename, headers=headers)
+    response = client.get(tablename)
     return json.loads(response.content)
 
 
-# Fetch CSV from WP data-police-shootings repo
-def get_new_data(data_type: str) -> dict:
-    if data_type == "person":
-        github_url = (
-            url
-        ) = r"https://raw.githubusercontent.com/washingtonpost/data-police-shootings/master/v2/fatal-police-shootings-data.csv"
-    if data_type == "agency":
-        github_url = (
-            url
-        ) = r"https://raw.githubusercontent.com/washingtonpost/data-police-shootings/master/v2/fatal-police-shootings-agencies.csv"
-
-    new_data_df = pd.read_csv(github_url)
-    new_data = json.loads(new_data_df.to_json(orient="records", index=True))
-    return new_data
-
-
-def update_record(new_record, old_record, tablename: str):
-    headers = get_headers()
-    for key in new_record:
-        if str(new_record[key]) != str(old_record[key]):
-            response = requests.put(
-                base_url + f"{tablename}/{new_record['id']}",
-                data=json.dumps(new_record),
-                headers=headers,
-            )
-            # if token expired get new token and resend request
-            if response.status_code == 401:
-                print("token expired... requesting new token before trying again")
-                headers = get_headers()
-
-                response = requests.put(
-                    base_url + f"{tablename}/{new_record['id']}",
-                    data=json.dumps(new_record),
-                    headers=headers,
-                )
-
-            print(f"update record {new_record['id']}")
-            return response.status_code
-
-
-def get_headers() -> dict:
-    headers = {
-        "Accept": "*/*",
-        "Content-Type": "application/json",
-        "x-access-token": get_token(),
-    }
-    return headers
-
-
-def update_database_person():
-    old_data = get_old_data(tablename="person")
-    new_data = get_new_data(data_type="person")
-    headers = get_headers()
-    # Compare each record in new data to old records
-    #     if id is the same and data is different -> update
-
-    for new_person in new_data:
-        in_old_data = False
-        for old_person in old_data["people"]:
-            if new_person["id"] == int(old_person["id"]):
-                in_old_data = True
-                print(str(new_person["id"]) + " is in old data")
-                update_record(new_person, old_person, tablename="person")
-
-        # if id is new -> add to db
-        if in_old_data == False:
-            print(str(new_person["id"]) + " is not in old data... adding to db")
-            print(json.dumps(new_person))
-            response = requests.post(
-                base_url + "/person", data=json.dumps(new_person), headers=headers
-            )
-            # if token expired get new token and resend request
-            if response.status_code == 401:
-                print("token expired... requesting new token before trying again")
-                headers = get_headers()
-
-                response = requests.post(
-                    base_url + "/person", data=json.dumps(new_person), headers=headers
-                )
-
-            print(f"{response.status_code} - {new_person['id']}")
-
-    # if id is not in new data but in old data -> delete
-    for old_person in old_data["people"]:
-        in_new_data = False
-        for new_person in new_data:
-            if str(old_person["id"]) == str(new_person["id"]):
-                in_new_data = True
-                break
-
-        if not in_new_data:
-            response = requests.delete(
-                base_url + "person/" + str(old_person["id"]), headers=headers
-            )
-            # if token expired get new token and resend request
-            if response.status_code == 401:
-                print("token expired... requesting new token before trying again")
-                headers = get_headers()
-
-                response = requests.delete(
-                    base_url + "person/" + str(old_person["id"]), headers=headers
-                )
-            print(f"{response.status_code} - {old_person['id']}")
-
-
-def update_database_agency():
-    old_data = get_old_data(tablename="agency")
-    new_data = get_new_data(data_type="agency")
-    headers = get_headers()
-    # Compare each record in new data to old records
-    #     if id is the same and data is different -> update
-
-    for new_agency in new_data:
-        in_old_data = False
-        for old_agency in old_data["agencies"]:
-            if new_agency["id"] == int(old_agency["id"]):
-                in_old_data = True
-                print(str(new_agency["id"]) + " is in old data")
-                update_record(new_agency, old_agency, tablename="agency")
-
-        # if id is new -> add to db
-        if in_old_data == False:
-            print(str(new_agency["id"]) + " is not in old data... adding to db")
-            print(json.dumps(new_agency))
-            response = requests.post(
-                base_url + "/agency", data=json.dumps(new_agency), headers=headers
-            )
-            # if token expired get new token and resend request
-            if response.status_code == 401:
-                print("token expired... requesting new token before trying again")
-                headers = get_headers()
-
-                response = requests.post(
-                    base_url + "/agency", data=json.dumps(new_agency), headers=headers
-                )
-
-            print(f"{response.status_code} - {new_agency['id']}")
-
-    # if id is not in new data but in old data -> delete
-    for old_agency in old_data["people"]:
-        in_new_data = False
-        for new_agency in new_data:
-            if str(old_agency["id"]) == str(new_agency["id"]):
-                in_new_data = True
-                break
-
-        if not in_new_data:
-            response = requests.delete(
-                base_url + "agency/" + str(old_agency["id"]), headers=headers
-            )
-            # if token expired get new token and resend request
-            if response.status_code == 401:
-                print("token expired... requesting new token before trying again")
-                headers = get_headers()
-
-                response = requests.delete(
-                    base_url + "agency/" + str(old_agency["id"]), headers=headers
-                )
-            print(f"{response.status_code} - {old_agency['id']}")
+def parse_csv(content: bytes) -> list:
+    new_data_df = pd.read_csv(io.BytesIO(content))
+    return json.loads(new_data_df.to_json(orient="records", index=True))
 
 
-def batch_add():
-    new_data = get_new_data()
-    headers = get_headers()
-    for person in new_data:
-        response = requests.post(
-            base_url + "person", data=json.dumps(person), headers=headers
+# Fetch CSV from WP data-police-shootings repo
+def get_new_data(data_type: str) -> list:
+    return parse_csv(fetch_source(data_type, force=True).content)
+
+
+def update_record(new_record, tablename: str):
+    response = client.put(
+        f"{tablename}/{new_record['id']}", data=json.dumps(new_record)
+    )
+    print(f"{response.status_code} - update record {new_record['id']}")
+    return response.status_code
+
+
+def add_record(new_record, tablename: str):
+    response = client.post(tablename, data=json.dumps(new_record))
+    print(f"{response.status_code} - {new_record['id']}")
+    return response.status_code
+
+
+def delete_record(record_id: str, tablename: str):
+    response = client.delete(f"{tablename}/{record_id}")
+    print(f"{response.status_code} - {record_id}")
+    return response.status_code
+
+
+# Send a changeset from diff_records to the API, concurrently.
+# Returns the ids of the records whose call did not come back 2xx.
+def apply_changes(changes: Changeset, tablename: str) -> list:
+    print(
+        f"{tablename}: {len(changes.inserts)} new, {len(changes.updates)} changed, "
+        f"{len(changes.deletes)} removed"
+    )
+
+    calls = [(update_record, record) for record in changes.updates]
+    calls += [(add_record, record) for record in changes.inserts]
+    calls += [(delete_record, record_id) for record_id in changes.deletes]
+
+    # client.run yields in completion order, so pair each status with its id
+    def send(call):
+        fn, record = call
+        record_id = record if fn is delete_record else record["id"]
+        return record_id, fn(record, tablename)
+
+    return [
+        record_id
+        for record_id, status in client.run(send, calls)
+        if not 200 <= status < 300
+    ]
+
+
+# Skip the whole diff/apply pipeline when upstream hasn't changed since the
+# last successful sync
+def update_database(tablename: str, key: str, force: bool = False):
+    fetch = fetch_source(tablename, force=force)
+    if not fetch.changed:
+        print(f"{tablename}: upstream CSV unchanged, nothing to do")
+        fetch.save()
+        return
+
+    old_data = get_old_data(tablename=tablename)
+    new_data = parse_csv(fetch.content)
+    changes = diff_records(
+        new_data, old_data[key], ignore=DIFF_IGNORE.get(tablename, ("db_id",))
+    )
+    failed = apply_changes(changes, tablename=tablename)
+    if failed:
+        # Leave the saved sha256/ETag alone so the next run diffs again
+        print(
+            f"{tablename}: {len(failed)} changes failed, not marking upstream as "
+            f"synced: {', '.join(str(record_id) for record_id in failed)}"
         )
-        # if token expired get new token and resend request
-        if response.status_code == 401:
-            print("token expired... requesting new token before trying again")
-            headers = get_headers()
+        return
+    fetch.save()
 
-            response = requests.post(
-                base_url + "person", data=json.dumps(person), headers=headers
-            )
 
-        print(response.status_code)
+def update_database_person(force: bool = False):
+    update_database("person", "people", force=force)
+
+
+def update_database_agency(force: bool = False):
+    update_database("agency", "agencies", force=force)
+
+
+def batch_add():
+    new_data = get_new_data("person")
+    for status in client.run(lambda person: add_record(person, "person"), new_data):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync the database with WaPo data")
+    parser.add_argument(
+        "--mode",
+        choices=("api", "copy"),
+        default="api",
+        help="api: diff and send changes through the API, "
+        "copy: COPY the CSV into Postgres and merge it there",
+    )
+    parser.add_argument("--table", choices=("person", "agency", "all"), default="all")
+    parser.add_argument(
+        "--force", action="store_true", help="sync even if upstream is unchanged"
+    )
+    args = parser.parse_args()
+
+    tables = ("agency", "person") if args.table == "all" else (args.table,)
+    for table in tables:
+        if args.mode == "copy":
+            from Utils.copy_sync import sync_via_copy
+
+            fetch = fetch_source(table, force=args.force)
+            if fetch.changed:
+                sync_via_copy(table, content=fetch.content)
+            else:
+                print(f"{table}: upstream CSV unchanged, nothing to do")
+            fetch.save()
+        elif table == "person":
+            update_database_person(force=args.force)
+        else:
+            update_database_agency(force=args.force)
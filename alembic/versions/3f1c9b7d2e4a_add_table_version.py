@@ -0,0 +1,33 @@
+"""Add table_version
+
+Revision ID: 3f1c9b7d2e4a
+Revises: e827dcc448ad
+Create Date: 2026-10-18 09:02:11.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9b7d2e4a'
+down_revision = 'e827dcc448ad'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    table_version = op.create_table('table_version',
+    sa.Column('table_name', sa.String(length=50), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(table_version, [
+        {'table_name': 'person', 'version': 1, 'updated_at': None},
+        {'table_name': 'agency', 'version': 1, 'updated_at': None},
+    ])
+
+
+def downgrade() -> None:
+    op.drop_table('table_version')
@@ -0,0 +1,54 @@
+"""Add person_rollup
+
+Revision ID: 8b2d4e6f1a3c
+Revises: 3f1c9b7d2e4a
+Create Date: 2026-10-18 10:14:37.902114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2d4e6f1a3c'
+down_revision = '3f1c9b7d2e4a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('person_rollup',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('state', sa.String(length=50), nullable=False),
+    sa.Column('year', sa.String(length=4), nullable=False),
+    sa.Column('race', sa.String(length=15), nullable=False),
+    sa.Column('gender', sa.String(length=15), nullable=False),
+    sa.Column('threat_type', sa.String(length=20), nullable=False),
+    sa.Column('armed_with', sa.String(length=50), nullable=False),
+    sa.Column('flee_status', sa.String(length=10), nullable=False),
+    sa.Column('body_camera', sa.String(length=5), nullable=False),
+    sa.Column('was_mental_illness_related', sa.String(length=5), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'year', 'race', 'gender', 'threat_type', 'armed_with', 'flee_status', 'body_camera', 'was_mental_illness_related', name='uq_person_rollup_dimensions')
+    )
+    # backfill from the existing person rows
+    op.execute(
+        """
+        INSERT INTO person_rollup (state, year, race, gender, threat_type, armed_with,
+            flee_status, body_camera, was_mental_illness_related, count)
+        SELECT coalesce(state, ''), coalesce(substr(date, 1, 4), ''),
+            coalesce(race, ''), coalesce(gender, ''), coalesce(threat_type, ''),
+            coalesce(armed_with, ''), coalesce(flee_status, ''),
+            CASE WHEN body_camera THEN 'True' WHEN NOT body_camera THEN 'False' ELSE '' END,
+            CASE WHEN was_mental_illness_related THEN 'True'
+                WHEN NOT was_mental_illness_related THEN 'False' ELSE '' END,
+            count(*)
+        FROM person
+        GROUP BY 1, 2, 3, 4, 5, 6, 7, 8, 9
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('person_rollup')
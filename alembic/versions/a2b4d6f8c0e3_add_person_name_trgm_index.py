@@ -0,0 +1,26 @@
+"""Add trigram index on person.name
+
+Revision ID: a2b4d6f8c0e3
+Revises: f1a3c5e7b9d2
+Create Date: 2026-10-18 15:02:11.583920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a2b4d6f8c0e3'
+down_revision = 'f1a3c5e7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # serves /person/search (ILIKE prefix and % similarity), see DB/search.py
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_person_name_trgm', 'person', ['name'], unique=False, postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    op.drop_index('ix_person_name_trgm', table_name='person')
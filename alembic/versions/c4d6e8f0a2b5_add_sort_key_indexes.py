@@ -0,0 +1,41 @@
+"""Add (sort column, db_id) indexes for keyset pagination
+
+Revision ID: c4d6e8f0a2b5
+Revises: b3c5d7e9f1a4
+Create Date: 2026-10-18 18:12:37.504193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d6e8f0a2b5'
+down_revision = 'b3c5d7e9f1a4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # serve the (column, db_id) > (value, db_id) ranges in API/pagination.py
+    op.create_index('ix_person_id_db_id', 'person', ['id', 'db_id'], unique=False)
+    op.create_index('ix_person_date_db_id', 'person', ['date', 'db_id'], unique=False)
+    op.create_index('ix_person_name_db_id', 'person', ['name', 'db_id'], unique=False)
+    op.create_index('ix_person_state_db_id', 'person', ['state', 'db_id'], unique=False)
+    op.create_index('ix_person_age_db_id', 'person', ['age', 'db_id'], unique=False)
+    op.create_index('ix_agency_id_db_id', 'agency', ['id', 'db_id'], unique=False)
+    op.create_index('ix_agency_name_db_id', 'agency', ['name', 'db_id'], unique=False)
+    op.create_index('ix_agency_state_db_id', 'agency', ['state', 'db_id'], unique=False)
+    op.create_index('ix_agency_total_shootings_db_id', 'agency', ['total_shootings', 'db_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agency_total_shootings_db_id', table_name='agency')
+    op.drop_index('ix_agency_state_db_id', table_name='agency')
+    op.drop_index('ix_agency_name_db_id', table_name='agency')
+    op.drop_index('ix_agency_id_db_id', table_name='agency')
+    op.drop_index('ix_person_age_db_id', table_name='person')
+    op.drop_index('ix_person_state_db_id', table_name='person')
+    op.drop_index('ix_person_name_db_id', table_name='person')
+    op.drop_index('ix_person_date_db_id', table_name='person')
+    op.drop_index('ix_person_id_db_id', table_name='person')
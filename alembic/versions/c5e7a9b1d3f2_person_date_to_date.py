@@ -0,0 +1,34 @@
+"""Convert person.date to DATE
+
+Revision ID: c5e7a9b1d3f2
+Revises: 8b2d4e6f1a3c
+Create Date: 2026-10-18 11:40:02.551873
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e7a9b1d3f2'
+down_revision = '8b2d4e6f1a3c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.alter_column('person', 'date',
+               existing_type=sa.String(length=15),
+               type_=sa.Date(),
+               existing_nullable=True,
+               postgresql_using="NULLIF(date, '')::date")
+    op.create_index(op.f('ix_person_date'), 'person', ['date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_person_date'), table_name='person')
+    op.alter_column('person', 'date',
+               existing_type=sa.Date(),
+               type_=sa.String(length=15),
+               existing_nullable=True,
+               postgresql_using="to_char(date, 'YYYY-MM-DD')")
@@ -0,0 +1,34 @@
+"""Add person.grid_cell
+
+Revision ID: d8f0b2c4e6a1
+Revises: c5e7a9b1d3f2
+Create Date: 2026-10-18 13:05:48.120334
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f0b2c4e6a1'
+down_revision = 'c5e7a9b1d3f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('person', sa.Column('grid_cell', sa.Integer(), nullable=True))
+    # 0.25 degree grid numbered row by row, see DB/geo.py
+    op.execute(
+        """
+        UPDATE person SET grid_cell =
+            LEAST(floor((latitude + 90) / 0.25)::int, 719) * 1440
+            + LEAST(floor((longitude + 180) / 0.25)::int, 1439)
+        """
+    )
+    op.create_index(op.f('ix_person_grid_cell'), 'person', ['grid_cell'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_person_grid_cell'), table_name='person')
+    op.drop_column('person', 'grid_cell')
@@ -0,0 +1,40 @@
+"""Add person_agency link table
+
+Revision ID: f1a3c5e7b9d2
+Revises: d8f0b2c4e6a1
+Create Date: 2026-10-18 14:21:37.402816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1a3c5e7b9d2'
+down_revision = 'd8f0b2c4e6a1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('person_agency',
+    sa.Column('person_id', sa.String(length=10), nullable=False),
+    sa.Column('agency_id', sa.String(length=10), nullable=False),
+    sa.ForeignKeyConstraint(['person_id'], ['person.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('person_id', 'agency_id')
+    )
+    op.create_index(op.f('ix_person_agency_agency_id'), 'person_agency', ['agency_id'], unique=False)
+    # split person.agency_ids ("12;45", older rows "12,45"), see DB/links.py
+    op.execute(
+        """
+        INSERT INTO person_agency (person_id, agency_id)
+        SELECT DISTINCT p.id, trim(a.agency_id)
+        FROM person AS p, regexp_split_to_table(p.agency_ids, '[;,]') AS a(agency_id)
+        WHERE p.id IS NOT NULL AND trim(a.agency_id) <> ''
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_person_agency_agency_id'), table_name='person_agency')
+    op.drop_table('person_agency')
@@ -0,0 +1,195 @@
+import base64
+from DB.models import db, Users
+from bench.seed import BENCH_API_KEY, BENCH_PASSWORD, BENCH_USER, FIRST_NAMES
+
+
+# One benchmarked request. path and body may be functions of the iteration
+# number, prepare (untimed) runs before every timed call. auth is "token"
+# (x-access-token), "apikey" (x-api-key), "basic" (login) or None. heavy
+# cases read a whole table and run fewer iterations.
+class Case:
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path,
+        body=None,
+        prepare=None,
+        heavy: bool = False,
+        auth: str = "token",
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+        self.heavy = heavy
+        self.auth = auth
+
+    def call(self, client, headers: dict, i: int):
+        path = self.path(i) if callable(self.path) else self.path
+        body = self.body(i) if callable(self.body) else self.body
+        if self.auth == "basic":
+            headers = self.login_headers()
+        elif self.auth == "apikey":
+            headers = {"x-api-key": BENCH_API_KEY}
+        elif self.auth is None:
+            headers = dict()
+        return client.open(path, method=self.method, json=body, headers=headers)
+
+    @staticmethod
+    def login_headers() -> dict:
+        credentials = f"{BENCH_USER}:{BENCH_PASSWORD}".encode()
+        return {"Authorization": f"Basic {base64.b64encode(credentials).decode()}"}
+
+
+def person_body(person_id: str) -> dict:
+    return {
+        "id": person_id,
+        "name": "Bench Person",
+        "date": "2020-06-01",
+        "body_camera": False,
+        "city": "Seattle",
+        "county": None,
+        "state": "WA",
+        "longitude": -122.33,
+        "latitude": 47.61,
+        "location_precision": "not_available",
+        "age": 30,
+        "gender": "male",
+        "race": "W",
+        "race_source": None,
+        "was_mental_illness_related": False,
+        "threat_type": "point",
+        "armed_with": "gun",
+        "flee_status": "not",
+        "agency_ids": "1;2",
+    }
+
+
+def agency_body(agency_id: str) -> dict:
+    return {
+        "id": agency_id,
+        "name": "Bench Agency",
+        "type": "local_police",
+        "state": "WA",
+        "oricodes": None,
+        "total_shootings": 0,
+    }
+
+
+def _create(path: str, body):
+    def prepare(client, headers: dict, i: int):
+        client.post(path, json=body(i), headers=headers)
+
+    return prepare
+
+
+# (prepare, path) for revoking a key created before each call
+def _revoke_key():
+    created = dict()
+
+    def prepare(client, headers: dict, i: int):
+        body = {"name": f"revoke{i}"}
+        response = client.post("/apikey", json=body, headers=headers)
+        created[i] = response.get_json()["id"]
+
+    return prepare, lambda i: f"/apikey/{created[i]}"
+
+
+def _create_user(client, headers: dict, i: int):
+    with client.application.app_context():
+        db.session.add(Users(public_id=f"bd{i}", name=f"bd{i}", password="x"))
+        db.session.commit()
+
+
+# Every route in API/views.py. Reads come first so the writes don't change
+# what they measure.
+def all_cases(persons: int) -> list:
+    middle = str(persons // 2)
+    revoke_prepare, revoke_path = _revoke_key()
+    return [
+        Case("person.all", "GET", "/person", heavy=True),
+        Case("person.page", "GET", "/person?limit=1000"),
+        Case("person.page.sorted", "GET", "/person?limit=1000&sort=date"),
+        Case("person.stream", "GET", "/person?stream=1", heavy=True),
+        Case("person.one", "GET", lambda i: f"/person/{i * 7919 % persons}"),
+        Case("person.one.expand", "GET", f"/person/{middle}?expand=agencies"),
+        Case("person.one.apikey", "GET", f"/person/{middle}", auth="apikey"),
+        Case("person.params", "GET", "/person/params?state=WA&race=B", heavy=True),
+        Case(
+            "person.params.fields",
+            "GET",
+            "/person/params?state=WA&fields=id,name,date",
+            heavy=True,
+        ),
+        Case(
+            "person.batch",
+            "POST",
+            "/person/batch?expand=agencies",
+            {"ids": [str(i * 7919 % persons) for i in range(1000)]},
+        ),
+        Case("person.search", "GET", f"/person/search?q={FIRST_NAMES[0]}%20Smth"),
+        Case("person.near", "GET", "/person/near?lat=40&lon=-100&radius_km=50"),
+        Case(
+            "person.bbox", "GET", "/person/bbox?south=40&west=-105&north=41&east=-104"
+        ),
+        Case("agency.all", "GET", "/agency", heavy=True),
+        Case("agency.page", "GET", "/agency?limit=1000"),
+        Case("agency.one", "GET", "/agency/1"),
+        Case("agency.params", "GET", "/agency/params?id=1&id=2&id=3"),
+        Case("agency.people", "GET", "/agency/1/people"),
+        Case("stats.rollup", "GET", "/stats/person?group_by=state,year"),
+        Case("stats.person", "GET", "/stats/person?group_by=state&age=30"),
+        Case("export.person.csv", "GET", "/export/person?format=csv", heavy=True),
+        Case("export.agency.csv", "GET", "/export/agency?format=csv", heavy=True),
+        Case("metrics", "GET", "/metrics"),
+        Case("user.all", "GET", "/user"),
+        Case("user.one", "GET", f"/user/{BENCH_USER}"),
+        Case("apikey.all", "GET", "/apikey"),
+        Case("login", "GET", "/login", auth="basic"),
+        Case("person.add", "POST", "/person", lambda i: person_body(f"ba{i}")),
+        Case(
+            "person.update",
+            "PUT",
+            f"/person/{middle}",
+            lambda i: person_body(middle),
+        ),
+        Case(
+            "person.delete",
+            "DELETE",
+            lambda i: f"/person/bd{i}",
+            prepare=_create("/person", lambda i: person_body(f"bd{i}")),
+        ),
+        Case(
+            "person.bulk",
+            "POST",
+            "/person/bulk",
+            lambda i: [person_body(f"bb{i}-{n}") for n in range(100)],
+        ),
+        Case("agency.add", "POST", "/agency", lambda i: agency_body(f"ba{i}")),
+        Case("agency.update", "PUT", "/agency/1", agency_body("1")),
+        Case(
+            "agency.delete",
+            "DELETE",
+            lambda i: f"/agency/bd{i}",
+            prepare=_create("/agency", lambda i: agency_body(f"bd{i}")),
+        ),
+        Case(
+            "agency.bulk",
+            "POST",
+            "/agency/bulk",
+            lambda i: [agency_body(f"bb{i}-{n}") for n in range(100)],
+        ),
+        Case(
+            "user.create",
+            "POST",
+            "/user",
+            lambda i: {"name": f"bench{i}", "password": "x"},
+            auth=None,
+        ),
+        Case("user.promote", "PUT", f"/user/{BENCH_USER}"),
+        Case("user.delete", "DELETE", lambda i: f"/user/bd{i}", prepare=_create_user),
+        Case("apikey.create", "POST", "/apikey", lambda i: {"name": f"bench{i}"}),
+        Case("apikey.revoke", "DELETE", revoke_path, prepare=revoke_prepare),
+    ]
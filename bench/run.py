@@ -0,0 +1,209 @@
+# Endpoint benchmarks through the Flask test client, no server involved:
+#
+#   python -m bench.run --size 1k --save-baseline      # record bench/baseline.json
+#   python -m bench.run --size 1k                      # compare against it
+#   python -m bench.run --size 100k --database postgresql://... --only person.
+#
+# Seeding drops and recreates the tables, so it refuses a database holding
+# anything but an earlier bench dataset unless --reseed is given.
+#
+# Latencies include the view, serialization and the after_request hooks.
+# Peak memory is measured separately with tracemalloc, which slows calls down.
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+import jwt
+from API import create_app
+from bench.cases import all_cases
+from bench.seed import BENCH_USER, SIZES, SeedError, seed
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# Regressions smaller than this are noise, whatever the ratio
+MIN_LATENCY_REGRESSION_MS = 1.0
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def bench_token(app) -> str:
+    return jwt.encode(
+        {
+            "public_id": BENCH_USER,
+            "exp": datetime.datetime.utcnow() + datetime.timedelta(hours=12),
+        },
+        app.config["SECRET_KEY"],
+    )
+
+
+# Read the whole body a chunk at a time without keeping it, so streamed and
+# export routes build every row but the peak isn't the joined body
+def drain(response):
+    for _ in response.response:
+        pass
+    response.close()
+
+
+# Runs case warmup + iterations times (counting i across both so generated
+# ids never repeat), then once more under tracemalloc
+def measure(client, headers: dict, case, iterations: int, warmup: int) -> dict:
+    timings = list()
+    errors = 0
+    for i in range(warmup + iterations + 1):
+        if case.prepare:
+            case.prepare(client, headers, i)
+        if i == warmup + iterations:
+            tracemalloc.start()
+            drain(case.call(client, headers, i))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            break
+
+        started = time.perf_counter()
+        response = case.call(client, headers, i)
+        response.get_data()
+        elapsed = time.perf_counter() - started
+        response.close()
+        if i >= warmup:
+            timings.append(elapsed * 1000)
+            errors += response.status_code >= 400
+
+    return {
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "throughput_rps": round(len(timings) / (sum(timings) / 1000), 1),
+        "peak_kib": round(peak / 1024, 1),
+        "iterations": len(timings),
+        "errors": errors,
+    }
+
+
+def run(args) -> dict:
+    database = args.database
+    if database is None:
+        database = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench.db')}"
+    app = create_app(database, {"SECRET_KEY": args.secret_key})
+    if not args.no_seed:
+        started = time.perf_counter()
+        try:
+            seed(app, SIZES[args.size], seed=args.seed, force=args.reseed)
+        except SeedError as e:
+            sys.exit(str(e))
+        print(f"seeded {args.size} in {time.perf_counter() - started:.1f}s")
+
+    client = app.test_client()
+    headers = {"x-access-token": bench_token(app)}
+    results = dict()
+    for case in all_cases(SIZES[args.size]):
+        if args.only and not any(case.name.startswith(o) for o in args.only):
+            continue
+        iterations = args.heavy_iterations if case.heavy else args.iterations
+        warmup = min(args.warmup, iterations)
+        results[case.name] = measure(client, headers, case, iterations, warmup)
+        r = results[case.name]
+        print(
+            f"{case.name:24} p50 {r['p50_ms']:9.2f}ms  p95 {r['p95_ms']:9.2f}ms  "
+            f"p99 {r['p99_ms']:9.2f}ms  {r['throughput_rps']:8.1f}/s  "
+            f"peak {r['peak_kib']:10.1f}KiB"
+            + (f"  {r['errors']} errors" if r["errors"] else "")
+        )
+
+    return {
+        "meta": {
+            "size": args.size,
+            "database": app.config["SQLALCHEMY_DATABASE_URI"].split(":")[0],
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "created": datetime.datetime.utcnow().isoformat(timespec="seconds"),
+        },
+        "routes": results,
+    }
+
+
+# Cases whose p95 latency or peak memory grew by more than tolerance
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = list()
+    for name, current in results["routes"].items():
+        previous = baseline["routes"].get(name)
+        if previous is None:
+            continue
+        grew = current["p95_ms"] - previous["p95_ms"]
+        if (
+            current["p95_ms"] > previous["p95_ms"] * (1 + tolerance)
+            and grew > MIN_LATENCY_REGRESSION_MS
+        ):
+            regressions.append(
+                f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms"
+            )
+        if current["peak_kib"] > previous["peak_kib"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak {previous['peak_kib']}KiB -> {current['peak_kib']}KiB"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark every API route")
+    parser.add_argument("--size", choices=tuple(SIZES), default="1k")
+    parser.add_argument(
+        "--database", help="SQLAlchemy URI, defaults to a SQLite file in the temp dir"
+    )
+    parser.add_argument(
+        "--no-seed", action="store_true", help="reuse the data already in --database"
+    )
+    parser.add_argument(
+        "--reseed",
+        action="store_true",
+        help="seed even if --database holds data the bench did not write",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="dataset random seed")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--heavy-iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument(
+        "--only", nargs="*", help="only cases whose name starts with one of these"
+    )
+    parser.add_argument("--secret-key", default="bench")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="write results to --baseline"
+    )
+    parser.add_argument("--output", help="also write results to this file")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="allowed relative growth of p95 latency and peak memory",
+    )
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["size"] != args.size:
+            sys.exit(f"baseline is for size {baseline['meta']['size']}")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against baseline")
@@ -0,0 +1,141 @@
+import datetime
+import random
+from sqlalchemy import inspect, insert, select
+from werkzeug.security import generate_password_hash
+from DB.models import db, Users, ApiKey, Person, Agency
+from DB.bulk import chunks
+from DB.geo import grid_cell
+from DB.links import rebuild_links, reconcile_agency_counts
+from DB.rollups import rebuild_rollup
+from DB.versioning import bump_version
+from API.api_keys import API_KEY_PREFIX_LENGTH, hash_api_key
+
+# Dataset sizes, in persons
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+SEED_BATCH_SIZE = 10_000
+
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench"
+BENCH_API_KEY = "bench-api-key"
+
+STATES = ("CA", "TX", "FL", "AZ", "GA", "CO", "WA", "OK", "NY", "OH")
+FIRST_NAMES = ("James", "Maria", "Robert", "Michael", "Jose", "David", "Daniel")
+LAST_NAMES = ("Smith", "Johnson", "Garcia", "Brown", "Jones", "Miller", "Davis")
+RACES = ("W", "B", "H", "A", "N", "O", None)
+THREATS = ("shoot", "point", "attack", "threat", "move", "flee", None)
+ARMED = ("gun", "knife", "unarmed", "vehicle", "replica", "undetermined", None)
+FLEE = ("not", "car", "foot", "other", None)
+FIRST_DAY = datetime.date(2015, 1, 1)
+
+
+def agency_count(persons: int) -> int:
+    return max(persons // 10, 10)
+
+
+def fake_person(rng: random.Random, index: int, agencies: int) -> dict:
+    latitude = rng.uniform(25, 49)
+    longitude = rng.uniform(-124, -67)
+    agency_ids = {str(rng.randrange(agencies)) for _ in range(rng.choice((1, 1, 2)))}
+    return {
+        "id": str(index),
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}{index}",
+        "date": FIRST_DAY + datetime.timedelta(days=rng.randrange(3650)),
+        "body_camera": rng.random() < 0.2,
+        "city": f"City{rng.randrange(500)}",
+        "county": None,
+        "state": rng.choice(STATES),
+        "longitude": longitude,
+        "latitude": latitude,
+        "location_precision": "not_available",
+        "age": rng.randrange(15, 80),
+        "gender": rng.choice(("male", "male", "female")),
+        "race": rng.choice(RACES),
+        "race_source": None,
+        "was_mental_illness_related": rng.random() < 0.2,
+        "threat_type": rng.choice(THREATS),
+        "armed_with": rng.choice(ARMED),
+        "flee_status": rng.choice(FLEE),
+        "agency_ids": ";".join(sorted(agency_ids)),
+        "grid_cell": grid_cell(latitude, longitude),
+    }
+
+
+def fake_agency(rng: random.Random, index: int) -> dict:
+    return {
+        "id": str(index),
+        "name": f"Agency {index}",
+        "type": rng.choice(("local_police", "sheriff", "state_police")),
+        "state": rng.choice(STATES),
+        "oricodes": None,
+        "total_shootings": 0,
+    }
+
+
+class SeedError(ValueError):
+    pass
+
+
+# seed() drops every table, so it only runs on databases that are empty or
+# that it seeded before. POST /user hands out uuid public_ids, never "bench".
+def holds_other_data(engine) -> bool:
+    tables = set(inspect(engine).get_table_names())
+    with engine.connect() as conn:
+        if "users" in tables:
+            bench = select(Users.id).where(Users.public_id == BENCH_USER)
+            if conn.execute(bench).first():
+                return False
+        for model in (Users, Person, Agency):
+            if model.__tablename__ in tables:
+                if conn.execute(select(model.__table__).limit(1)).first():
+                    return True
+    return False
+
+
+# Recreate every table and fill it with a deterministic dataset of persons
+# people, plus the derived tables the views read. Refuses databases holding
+# data it didn't write unless force is set.
+def seed(app, persons: int, seed: int = 0, force: bool = False):
+    rng = random.Random(seed)
+    agencies = agency_count(persons)
+    with app.app_context():
+        if not force and holds_other_data(db.engine):
+            raise SeedError(
+                f"{db.engine.url} holds data that was not seeded by the bench, "
+                "pass --reseed to drop it anyway"
+            )
+        db.drop_all()
+        db.create_all()
+        user = Users(
+            public_id=BENCH_USER,
+            name=BENCH_USER,
+            password=generate_password_hash(BENCH_PASSWORD, method="sha256"),
+            admin=True,
+        )
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(
+            ApiKey(
+                key_hash=hash_api_key(BENCH_API_KEY, app.config["SECRET_KEY"]),
+                prefix=BENCH_API_KEY[:API_KEY_PREFIX_LENGTH],
+                name=BENCH_USER,
+                user_id=user.id,
+                created_at=datetime.datetime.utcnow().replace(microsecond=0),
+            )
+        )
+        rows = [fake_agency(rng, i) for i in range(agencies)]
+        for chunk in chunks(rows, SEED_BATCH_SIZE):
+            db.session.execute(insert(Agency), chunk)
+        for start in range(0, persons, SEED_BATCH_SIZE):
+            rows = [
+                fake_person(rng, i, agencies)
+                for i in range(start, min(start + SEED_BATCH_SIZE, persons))
+            ]
+            db.session.execute(insert(Person), rows)
+
+        rebuild_links(db.session)
+        reconcile_agency_counts(db.session)
+        rebuild_rollup(db.session)
+        bump_version(db.session, "person")
+        bump_version(db.session, "agency")
+        db.session.commit()